@@ -1,152 +1,391 @@
-from flask import Flask, jsonify, request
+import json
+import os
+
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from datastore import ArtifactStore, DatasetStore, DerivedCache
+from formats import (
+    ARROW_MIME, COMPRESS_MIN_BYTES, FORMATS, JSON_MIME,
+    available_encodings, pa, to_arrow, to_csv_text, to_json_text, to_ndjson,
+)
+from metrics import RequestMetrics
+from respcache import ResponseCache
+from relation import RelationCube
+from scenario import ScenarioModel
+from rollup import DIMENSIONS, RollupCube, grouping_key
+from synergy import DEFAULT_WEIGHTS, INDEX_COLUMNS, MODES, SynergyCube
+
 app = Flask(__name__)
-CORS(app)  # 允许前端跨域访问
+CORS(app, expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"])  # 允许前端跨域访问
+
+# 数据目录基础路径（可用环境变量 LOWCARBON_DATA_DIR 指向其他数据目录，如基准测试生成的数据）
+DATA_BASE = Path(os.environ.get("LOWCARBON_DATA_DIR") or Path(__file__).resolve().parent / "data")
+
+
+# 进程级数据集注册表：每张表只解析一次，文件变化时自动重载
+store = DatasetStore(DATA_BASE)
+
+
+# 序列化结果缓存：数据未变化时同一 (endpoint, 查询参数) 直接复用响应字节；
+# 每个 worker 的缓存总字节数上限可用 LOWCARBON_CACHE_MB 设置（默认 64 MB）
+response_cache = ResponseCache(maxsize=256, maxbytes=int(os.environ.get("LOWCARBON_CACHE_MB", 64)) * 1024 * 1024)
+store.on_reload(response_cache.invalidate)
+
+
+# what-if 情景推演所用的模型工件（由 process_all.py 的 forecast 阶段写出）
+scenario_models = ArtifactStore(DATA_BASE / "meta" / "forecast_model.json", ScenarioModel.load)
+
+# 滑动窗口相关矩阵（由 process_all.py 的 relation 阶段写出）
+relation_cubes = ArtifactStore(DATA_BASE / "derived" / "relation_cube.npz", RelationCube.load)
+
+# 可调权重协同指数所用的 (年份 × 省份 × 3) 数组，随 province_combined 版本重建
+synergy_cubes = DerivedCache(SynergyCube)
+
+# 汇总立方体按 grouping 拆分后的子表（由 process_all.py 的 rollup 阶段写出 derived/rollup_cube.csv）
+rollup_cubes = DerivedCache(RollupCube)
+
+# 单次情景请求允许的最大年份跨度
+MAX_SCENARIO_YEARS = 200
+
+
+# 请求级延迟 / 阶段耗时 / 响应字节数指标，由 /metrics 输出
+request_metrics = RequestMetrics()
+
+# 慢请求日志阈值（毫秒）；未设置时不记录
+SLOW_REQUEST_MS = float(os.environ["LOWCARBON_SLOW_MS"]) if os.environ.get("LOWCARBON_SLOW_MS") else None
+
+
+@app.before_request
+def start_request_metrics():
+    request_metrics.start()
+
+
+@app.after_request
+def record_request_metrics(resp):
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    # 流式响应不计字节数（calculate_content_length 会提前消费生成器）
+    nbytes = None if resp.is_streamed else resp.calculate_content_length()
+    recorded = request_metrics.finish(route, request.method, resp.status_code, nbytes)
+    if recorded is not None and SLOW_REQUEST_MS is not None and recorded[0] * 1000 >= SLOW_REQUEST_MS:
+        elapsed, phases = recorded
+        detail = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in phases.items())
+        app.logger.warning("slow request %s %s -> %s %.1fms %s",
+                           request.method, request.full_path.rstrip("?"), resp.status_code, elapsed * 1000, detail)
+    return resp
+
+
+def get_dataset(folder, name):
+    """从数据集注册表取 Dataset，耗时计入 load 阶段"""
+    with request_metrics.phase("load"):
+        return store.get(folder, name)
+
+
+def cached_response(serialize, *datasets, mimetype=JSON_MIME, variant=None, headers=None):
+    """缓存 serialize() 产出的字节；命中缓存时跳过过滤与序列化，支持 ETag / 304 与 gzip / brotli。
+    datasets 为 datastore.Versioned（Dataset 或其派生对象）：version 进入缓存键，key 作为失效依赖；
+    headers 为 serialize() 执行期间填充的附加响应头（如分页游标），随条目一并缓存"""
+    key = (
+        request.endpoint,
+        variant,
+        tuple(sorted(request.args.items(multi=True))),
+        tuple(ds.version for ds in datasets),
+    )
+    entry = response_cache.get(key)
+    if entry is None:
+        body = serialize()
+        entry = response_cache.put(key, body, mimetype, [ds.key for ds in datasets], headers)
+
+    encoding = None
+    if len(entry.body) >= COMPRESS_MIN_BYTES:
+        encoding = request.accept_encodings.best_match(available_encodings())
+    # 不同编码的表示需使用不同的强 ETag
+    etag = entry.etag if encoding is None else f"{entry.etag}-{encoding}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        with request_metrics.phase("compress"):
+            body = entry.body if encoding is None else response_cache.encode(entry, encoding)
+        resp = Response(body, mimetype=entry.mimetype)
+        if encoding is not None:
+            resp.headers["Content-Encoding"] = encoding
+    resp.headers.update(entry.headers)
+    resp.set_etag(etag)
+    resp.vary.update(["Accept", "Accept-Encoding"])
+    return resp
+
+
+def negotiate_format():
+    """?format= 优先；否则按 Accept 头在 JSON 与 Arrow 之间协商"""
+    fmt = request.args.get("format")
+    if fmt is None:
+        best = request.accept_mimetypes.best_match([JSON_MIME, ARROW_MIME])
+        fmt = "arrow" if best == ARROW_MIME else "records"
+    return fmt
 
-# 数据目录基础路径
-DATA_BASE = Path(__file__).resolve().parent / "data"
 
+def format_error(fmt):
+    """格式不可用时返回错误响应，否则返回 None"""
+    if fmt not in FORMATS:
+        return jsonify({"error": f"unknown format: {fmt}", "available": list(FORMATS)}), 400
+    if fmt == "arrow" and pa is None:
+        return jsonify({"error": "arrow format requires pyarrow"}), 406
+    return None
+
+
+class QueryError(ValueError):
+    """查询参数不合法（返回 400）"""
+
+
+def split_arg(name):
+    items = [v.strip() for v in request.args.get(name, "").split(",") if v.strip()]
+    return items or None
+
+
+def parse_filters():
+    """通用行过滤参数：province / year / provinces=a,b,c / year_from / year_to"""
+    return {
+        "province": request.args.get("province"),
+        "year": request.args.get("year", type=int),
+        "provinces": split_arg("provinces"),
+        "year_from": request.args.get("year_from", type=int),
+        "year_to": request.args.get("year_to", type=int),
+    }
+
+
+def project(df, fields):
+    """fields=a,b 列投影；重复的列名只保留首次出现的一个"""
+    if fields is None:
+        return df
+    fields = list(dict.fromkeys(fields))
+    missing = [f for f in fields if f not in df.columns]
+    if missing:
+        raise QueryError(f"unknown fields: {','.join(missing)}")
+    return df[fields]
+
+
+def paginate(df, headers):
+    """limit / cursor 分页：cursor 取上一页响应头 X-Next-Cursor 的值（行偏移）"""
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor", 0, type=int)
+    if limit is None and not cursor:
+        return df
+    if cursor < 0 or (limit is not None and limit <= 0):
+        raise QueryError("limit must be positive and cursor non-negative")
+    total = len(df)
+    end = total if limit is None else min(cursor + limit, total)
+    headers["X-Total-Count"] = str(total)
+    if end < total:
+        headers["X-Next-Cursor"] = str(end)
+    return df.iloc[cursor:end]
+
+
+def frame_response(build, *datasets):
+    """build(filters) 返回过滤后的 DataFrame；统一做分页与列投影后，按协商的格式
+    （records / columns / arrow）序列化"""
+    fmt = negotiate_format()
+    error = format_error(fmt)
+    if error is not None:
+        return error
+    filters = parse_filters()
+    fields = split_arg("fields")
+    headers = {}
+
+    def serialize():
+        with request_metrics.phase("filter"):
+            df = project(paginate(build(filters), headers), fields)
+        with request_metrics.phase("serialize"):
+            return to_arrow(df) if fmt == "arrow" else to_json_text(df, fmt).encode("utf-8")
 
-def load_csv(folder, name):
-    """加载 CSV 文件，并处理 UTF-8 BOM 与列名清理"""
-    path = DATA_BASE / folder / name
-    if not path.exists():
-        return None
-    # 兼容带 BOM 的 CSV
     try:
-        df = pd.read_csv(path, encoding="utf-8-sig")
-    except Exception:
-        df = pd.read_csv(path)
-    # 列名清理：去掉不可见字符与首尾空格
-    df.columns = [str(c).replace("\ufeff", "").strip() for c in df.columns]
-    return df
+        return cached_response(serialize, *datasets, mimetype=ARROW_MIME if fmt == "arrow" else JSON_MIME,
+                               variant=fmt, headers=headers)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 # —— 新增：分别提供排放、能源、绿化三个数据源 ——
 @app.route("/api/emission", methods=["GET"])
 def get_emission_total():
     """返回排放相关字段（含 is_imputed_emission 标记与 emission_per_gdp）"""
-    df = load_csv("processed", "province_emission.csv")
-    if df is None:
+    ds = get_dataset("processed", "province_emission.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    province = request.args.get("province")
-    year = request.args.get("year", type=int)
     # 尽可能包含可用字段：emission_total、emission_per_gdp、is_imputed_emission
-    cols = [c for c in ["province", "year", "emission_total", "emission_per_gdp", "is_imputed_emission"] if c in df.columns]
-    df = df[cols]
-    if province:
-        df = df[df["province"] == province]
-    if year is not None:
-        df = df[df["year"] == year]
-    return df.to_json(orient="records", force_ascii=False)
+    cols = [c for c in ["province", "year", "emission_total", "emission_per_gdp", "is_imputed_emission"] if c in ds.df.columns]
+    return frame_response(lambda f: ds.select(cols=cols, **f), ds)
 
 
 @app.route("/api/energy", methods=["GET"])
 def get_energy_ratio():
     """返回清洁能源比例（province_energy.csv 的 clean_ratio 字段）"""
-    df = load_csv("processed", "province_energy.csv")
-    if df is None:
+    ds = get_dataset("processed", "province_energy.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    province = request.args.get("province")
-    year = request.args.get("year", type=int)
     cols = ["province", "year", "clean_ratio"]
-    df = df[cols]
-    if province:
-        df = df[df["province"] == province]
-    if year is not None:
-        df = df[df["year"] == year]
-    return df.to_json(orient="records", force_ascii=False)
+    return frame_response(lambda f: ds.select(cols=cols, **f), ds)
 
 
 @app.route("/api/green", methods=["GET"])
 def get_green_rate():
     """返回绿化覆盖率（province_green.csv 的 green_rate 字段）"""
-    df = load_csv("processed", "province_green.csv")
-    if df is None:
+    ds = get_dataset("processed", "province_green.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    province = request.args.get("province")
-    year = request.args.get("year", type=int)
     cols = ["province", "year", "green_rate"]
     # 一些年份可能缺失 green_rate，保留空值以便前端处理
-    df = df[cols]
-    if province:
-        df = df[df["province"] == province]
-    if year is not None:
-        df = df[df["year"] == year]
-    return df.to_json(orient="records", force_ascii=False)
+    return frame_response(lambda f: ds.select(cols=cols, **f), ds)
 
 
 @app.route("/api/province", methods=["GET"])
 def get_province_data():
     """返回综合指标表（province_combined.csv）"""
-    df = load_csv("processed", "province_combined.csv")
-    if df is None:
+    ds = get_dataset("processed", "province_combined.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-
-    province = request.args.get("province")
-    if province:
-        df = df[df["province"] == province]
-
-    return df.to_json(orient="records", force_ascii=False)
+    return frame_response(lambda f: ds.select(**f), ds)
 
 
 @app.route("/api/synergy", methods=["GET"])
 def get_synergy_index():
-    """返回协同指数（province_synergy_index.csv）"""
-    df = load_csv("derived", "province_synergy_index.csv")
-    if df is None:
+    """返回协同指数（province_synergy_index.csv）；
+    指定 weights= 或 mode= 时改为按给定权重 / 标准化方式即时计算"""
+    if "weights" in request.args or "mode" in request.args:
+        return get_weighted_synergy()
+    ds = get_dataset("derived", "province_synergy_index.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    return frame_response(lambda f: ds.select(**f), ds)
+
+
+def get_weighted_synergy():
+    """weights=energy,eco,efficiency 三个权重（缺省 0.4,0.3,0.3）；
+    mode=zscore（缺省，与流水线一致）/ minmax / rank 为逐年标准化方式"""
+    mode = request.args.get("mode", "zscore")
+    if mode not in MODES:
+        return jsonify({"error": f"unknown mode: {mode}", "available": list(MODES)}), 400
+    try:
+        weights = tuple(float(w) for w in split_arg("weights") or DEFAULT_WEIGHTS)
+    except ValueError:
+        return jsonify({"error": "weights must be numbers"}), 400
+    if len(weights) != len(INDEX_COLUMNS) or not all(np.isfinite(weights)):
+        return jsonify({"error": f"weights must be {len(INDEX_COLUMNS)} finite numbers: {','.join(INDEX_COLUMNS)}"}), 400
+    if not any(weights):
+        return jsonify({"error": "at least one weight must be non-zero"}), 400
+    ds = get_dataset("processed", "province_combined.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    return df.to_json(orient="records", force_ascii=False)
+    cube = synergy_cubes.get(ds)
+    return frame_response(lambda f: cube.scores(mode, weights).select(**f), cube)
 
 # —— 新增：标准化指标（energy_index / eco_index / efficiency_index） ——
 @app.route("/api/standardized", methods=["GET"])
 def get_standardized_index():
     """返回标准化指标（derived/province_standardized.csv）"""
-    df = load_csv("derived", "province_standardized.csv")
-    if df is None:
-        return jsonify({"error": "file not found"}), 404
-    province = request.args.get("province")
-    year = request.args.get("year", type=int)
-    cols = [c for c in ["province", "year", "energy_index", "eco_index", "efficiency_index"] if c in df.columns]
-    df = df[cols]
-    if province:
-        df = df[df["province"] == province]
-    if year is not None:
-        df = df[df["year"] == year]
-    return df.to_json(orient="records", force_ascii=False)
+    ds = get_dataset("derived", "province_standardized.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    cols = [c for c in ["province", "year", "energy_index", "eco_index", "efficiency_index"] if c in ds.df.columns]
+    return frame_response(lambda f: ds.select(cols=cols, **f), ds)
 
 # —— 新增：变量相关性数据（clean_ratio / green_rate / emission_per_gdp 之间逐年相关） ——
+def per_province_scope():
+    return request.args.get("scope") == "province" or bool(split_arg("province") or split_arg("provinces"))
+
+
 @app.route("/api/relation", methods=["GET"])
 def get_variable_relation():
-    """返回变量相关性（derived/province_relation.csv）"""
-    df = load_csv("derived", "province_relation.csv")
-    if df is None:
+    """返回变量相关性（derived/province_relation.csv）；
+    指定 window= 、province / provinces 或 scope=province 时改由滑动窗口相关矩阵切片返回"""
+    if "window" in request.args or per_province_scope():
+        return get_rolling_relation()
+    ds = get_dataset("derived", "province_relation.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    cols = [c for c in ["year", "variable_x", "variable_y", "correlation"] if c in ds.df.columns]
+    return frame_response(lambda f: ds.select(cols=cols, **f), ds)
+
+
+def get_rolling_relation():
+    """window=N：截至各年份的 N 年窗口相关矩阵（derived/relation_cube.npz）；
+    variables=a,b 选变量；province / provinces 或 scope=province 时返回各省自身时间序列相关，
+    此时窗口须不小于计算时的 min_obs，缺省取满足条件的最小窗口"""
+    with request_metrics.phase("load"):
+        cube = relation_cubes.get()
+    if cube is None:
         return jsonify({"error": "file not found"}), 404
-    year = request.args.get("year", type=int)
-    cols = [c for c in ["year", "variable_x", "variable_y", "correlation"] if c in df.columns]
-    df = df[cols]
-    if year is not None:
-        df = df[df["year"] == year]
-    return df.to_json(orient="records", force_ascii=False)
+    available = cube.province_windows() if per_province_scope() else cube.windows
+    if not available:
+        return jsonify({"error": f"no window has at least {cube.min_obs} years"}), 400
+    window = request.args.get("window", available[0], type=int)
+    if window not in available:
+        return jsonify({"error": f"unknown window: {window}", "available": available}), 400
+    variables = split_arg("variables")
+    all_provinces = request.args.get("scope") == "province"
+
+    def build(filters):
+        years = None
+        if filters["year"] is not None:
+            years = [filters["year"]]
+        elif filters["year_from"] is not None or filters["year_to"] is not None:
+            lo = cube.years[0] if filters["year_from"] is None else filters["year_from"]
+            hi = cube.years[-1] if filters["year_to"] is None else filters["year_to"]
+            years = range(lo, hi + 1)
+        provinces = filters["provinces"] or ([filters["province"]] if filters["province"] else None)
+        if provinces is None and all_provinces:
+            provinces = cube.provinces
+        return cube.select(window, years, variables, provinces)
+
+    return frame_response(build, cube)
 
 
 @app.route("/api/cluster", methods=["GET"])
 def get_cluster_result():
     """返回聚类结果（cluster_result.csv）"""
-    df = load_csv("derived", "cluster_result.csv")
-    if df is None:
+    ds = get_dataset("derived", "cluster_result.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    return df.to_json(orient="records", force_ascii=False)
+    return frame_response(lambda f: ds.select(**f), ds)
+
+
+@app.route("/api/cluster/trajectory", methods=["GET"])
+def get_cluster_trajectory():
+    """返回逐年聚类轨迹（cluster_trajectory.csv）；k= 指定类别数，
+    缺省取各年平均轮廓系数最高的 k"""
+    ds = get_dataset("derived", "cluster_trajectory.csv")
+    sil = get_dataset("derived", "cluster_silhouette.csv")
+    if ds is None or sil is None:
+        return jsonify({"error": "file not found"}), 404
+    k = request.args.get("k", type=int)
+    if k is None:
+        k = int(sil.df.groupby("k")["silhouette"].mean().idxmax())
+    elif k not in set(sil.df["k"]):
+        return jsonify({"error": f"unknown k: {k}", "available": sorted(int(v) for v in sil.df["k"].unique())}), 400
+
+    def build(filters):
+        df = ds.select(**filters)
+        return df[df["k"].to_numpy() == k]
+
+    return frame_response(build, ds, sil)
+
+
+@app.route("/api/cluster/silhouette", methods=["GET"])
+def get_cluster_silhouette():
+    """返回各年份 × 候选 k 的轮廓系数与簇内平方和（cluster_silhouette.csv）"""
+    ds = get_dataset("derived", "cluster_silhouette.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    return frame_response(lambda f: ds.select(**f), ds)
 
 
 @app.route("/api/policy", methods=["GET"])
 def get_policy_timeline():
     """返回政策事件时间线"""
-    df = load_csv("derived", "policy_timeline.csv")
-    if df is None:
+    ds = get_dataset("derived", "policy_timeline.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
     # 关键字段规范化
     rename_map = {
@@ -157,34 +396,281 @@ def get_policy_timeline():
         "level": "level",
     }
     # 仅保留需要的列，避免意外列影响前端
-    cols = [c for c in rename_map.keys() if c in df.columns]
-    # 如果第一列名异常（如 BOM 导致），load_csv 已处理；这里再稳妥转换 year 类型
-    if "year" in df.columns:
-        try:
-            df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64").astype(int)
-        except Exception:
-            pass
-    df = df[cols]
-    return df.to_json(orient="records", force_ascii=False)
+    cols = [c for c in rename_map.keys() if c in ds.df.columns]
+
+    def build(filters):
+        # 列名中的 BOM 已在 datastore.read_csv 加载时清理；这里再稳妥转换 year 类型
+        df = ds.select(cols=cols, **filters).copy()
+        if "year" in df.columns:
+            try:
+                df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64").astype(int)
+            except Exception:
+                pass
+        return df
+
+    return frame_response(build, ds)
 
 
 # —— 新增：时序演化分析所需数据 ——
 @app.route("/api/temporal/trend", methods=["GET"])
 def get_temporal_trend():
     """返回时序趋势数据（province_trend.csv）"""
-    df = load_csv("derived", "province_trend.csv")
-    if df is None:
+    ds = get_dataset("derived", "province_trend.csv")
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    return df.to_json(orient="records", force_ascii=False)
+    return frame_response(lambda f: ds.select(**f), ds)
 
 
 @app.route("/api/temporal/delta", methods=["GET"])
 def get_temporal_delta():
     """返回时序变化率数据（province_delta.csv）"""
-    df = load_csv("derived", "province_delta.csv")
-    if df is None:
+    ds = get_dataset("derived", "province_delta.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    return frame_response(lambda f: ds.select(**f), ds)
+
+
+# —— 新增：预汇总查询 ——
+@app.route("/api/rollup", methods=["GET"])
+def get_rollup():
+    """by=region,year 等维度组合（region / province / year / cluster_type，缺省为总计）直接返回预汇总行；
+    region= / cluster_type= 可为逗号分隔的多个值；带过滤条件的维度并入 by（如 ?region=西部 等同
+    ?by=region&region=西部），保证结果只含满足条件的分组，而不是已汇总掉该维度的总计。
+    cluster_type 为省份在基准年聚类（cluster_result.csv，默认 2022 年）中的类别，对全部年份固定不变：
+    by=year,cluster_type 表示“按 2022 年所属类别分组的各年汇总”，而非各年当年的类别
+    （逐年类别见 /api/cluster/trajectory）"""
+    by = split_arg("by") or []
+    unknown = [d for d in by if d not in DIMENSIONS]
+    if unknown:
+        return jsonify({"error": f"unknown dimension: {','.join(unknown)}", "available": list(DIMENSIONS)}), 400
+    try:
+        cluster_types = [int(c) for c in split_arg("cluster_type") or []] or None
+    except ValueError:
+        return jsonify({"error": "cluster_type must be integers"}), 400
+    regions = split_arg("region")
+    ds = get_dataset("derived", "rollup_cube.csv")
+    if ds is None:
+        return jsonify({"error": "file not found"}), 404
+    cube = rollup_cubes.get(ds)
+    filtered = {
+        "region": regions is not None,
+        "cluster_type": cluster_types is not None,
+        "province": split_arg("province") is not None or split_arg("provinces") is not None,
+        "year": any(request.args.get(k, type=int) is not None for k in ("year", "year_from", "year_to")),
+    }
+    grouping = grouping_key(set(by) | {d for d, on in filtered.items() if on})
+    if grouping not in cube.groupings:
+        return jsonify({"error": f"grouping not available: {grouping}", "available": list(cube.groupings)}), 400
+    return frame_response(lambda f: cube.select(grouping, regions, cluster_types, **f), cube)
+
+
+# —— 新增：what-if 情景推演 ——
+@app.route("/api/scenario", methods=["GET"])
+def get_scenario():
+    """按给定 clean_ratio / green_rate 增量（clean_delta / green_delta，可选逐年 clean_ramp / green_ramp）
+    即时预测 emission_per_gdp；省份取 province / provinces，年份取 year 或 year_from–year_to，默认取模型预测区间"""
+    with request_metrics.phase("load"):
+        model = scenario_models.get()
+    if model is None:
+        return jsonify({"error": "file not found"}), 404
+    try:
+        shifts = tuple(float(request.args.get(k, 0)) for k in ["clean_delta", "green_delta", "clean_ramp", "green_ramp"])
+    except ValueError:
+        return jsonify({"error": "deltas must be numbers"}), 400
+    if not all(np.isfinite(shifts)):
+        return jsonify({"error": "deltas must be finite numbers"}), 400
+
+    def build(filters):
+        provinces = filters["provinces"] or ([filters["province"]] if filters["province"] else model.provinces)
+        if filters["year"] is not None:
+            years = [filters["year"]]
+        else:
+            lo = model.start_year if filters["year_from"] is None else filters["year_from"]
+            hi = model.end_year if filters["year_to"] is None else filters["year_to"]
+            if hi - lo + 1 > MAX_SCENARIO_YEARS:
+                raise QueryError(f"year range exceeds {MAX_SCENARIO_YEARS} years")
+            years = range(lo, hi + 1)
+        return model.predict(tuple(provinces), tuple(years), *shifts)
+
+    return frame_response(build, model)
+
+
+# —— 新增：批量取数 / 流式导出所用的数据表登记 ——
+# 名称 → (目录, 文件, 返回列)；列为 None 表示整表返回
+DATASETS = {
+    "emission": ("processed", "province_emission.csv",
+                 ["province", "year", "emission_total", "emission_per_gdp", "is_imputed_emission"]),
+    "energy": ("processed", "province_energy.csv", ["province", "year", "clean_ratio"]),
+    "green": ("processed", "province_green.csv", ["province", "year", "green_rate"]),
+    "province": ("processed", "province_combined.csv", None),
+    "standardized": ("derived", "province_standardized.csv",
+                     ["province", "year", "energy_index", "eco_index", "efficiency_index"]),
+    "synergy": ("derived", "province_synergy_index.csv", None),
+    "relation": ("derived", "province_relation.csv", ["year", "variable_x", "variable_y", "correlation"]),
+    "cluster": ("derived", "cluster_result.csv", None),
+    "cluster_trajectory": ("derived", "cluster_trajectory.csv", None),
+    "cluster_silhouette": ("derived", "cluster_silhouette.csv", None),
+    "trend": ("derived", "province_trend.csv", None),
+    "delta": ("derived", "province_delta.csv", None),
+}
+
+
+@app.route("/api/bundle", methods=["GET"])
+def get_bundle():
+    """按 datasets=a,b,c 一次返回多张表：{"a": [...], "b": [...]}；
+    行过滤参数对含该列的表统一生效，fields 仅保留各表中存在的列；
+    分页参数（limit / cursor）对多表没有统一含义，不予支持"""
+    names = [n.strip() for n in request.args.get("datasets", "").split(",") if n.strip()]
+    if not names:
+        return jsonify({"error": "datasets is required", "available": list(DATASETS)}), 400
+    unknown = [n for n in names if n not in DATASETS]
+    if unknown:
+        return jsonify({"error": f"unknown dataset: {','.join(unknown)}", "available": list(DATASETS)}), 400
+    names = list(dict.fromkeys(names))
+    paging = [k for k in ("limit", "cursor") if k in request.args]
+    if paging:
+        return jsonify({"error": f"{','.join(paging)} is not supported for bundle; page each dataset via its own endpoint"}), 400
+
+    tables = {}
+    for name in names:
+        folder, fname, _ = DATASETS[name]
+        ds = get_dataset(folder, fname)
+        if ds is None:
+            return jsonify({"error": "file not found", "dataset": name}), 404
+        tables[name] = ds
+
+    fmt = negotiate_format()
+    if fmt == "arrow":
+        # Arrow IPC 流只承载单表，批量接口仅提供 JSON
+        return jsonify({"error": "arrow format is not supported for bundle"}), 406
+    error = format_error(fmt)
+    if error is not None:
+        return error
+    filters = parse_filters()
+    fields = split_arg("fields")
+
+    def serialize():
+        parts = []
+        for name, ds in tables.items():
+            cols = DATASETS[name][2] or list(ds.df.columns)
+            cols = [c for c in cols if c in ds.df.columns and (fields is None or c in fields)]
+            with request_metrics.phase("filter"):
+                df = ds.select(cols=cols, **filters)
+            with request_metrics.phase("serialize"):
+                parts.append(f"{json.dumps(name)}:{to_json_text(df, fmt)}")
+        return ("{" + ",".join(parts) + "}").encode("utf-8")
+
+    return cached_response(serialize, *tables.values(), variant=fmt)
+
+
+# 流式导出：每块行数的默认值与上限
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_MAX_CHUNK_ROWS = 100000
+
+
+@app.route("/api/export/<dataset>", methods=["GET"])
+def export_dataset(dataset):
+    """流式导出整表：format=ndjson（默认）或 csv，按 chunk 行分块生成，
+    支持与其他接口相同的 province / year / provinces / year_from / year_to 过滤"""
+    if dataset not in DATASETS:
+        return jsonify({"error": f"unknown dataset: {dataset}", "available": list(DATASETS)}), 404
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": f"unknown format: {fmt}", "available": ["ndjson", "csv"]}), 400
+    chunk = request.args.get("chunk", EXPORT_CHUNK_ROWS, type=int)
+    if not 0 < chunk <= EXPORT_MAX_CHUNK_ROWS:
+        return jsonify({"error": f"chunk must be in 1..{EXPORT_MAX_CHUNK_ROWS}"}), 400
+    folder, fname, cols = DATASETS[dataset]
+    ds = get_dataset(folder, fname)
+    if ds is None:
         return jsonify({"error": "file not found"}), 404
-    return df.to_json(orient="records", force_ascii=False)
+
+    df = ds.df if cols is None else ds.df[[c for c in cols if c in ds.df.columns]]
+    rows = ds.rows(**parse_filters())
+    total = len(df) if rows is None else len(rows)
+
+    def generate():
+        # 逐块切片、逐块序列化，内存占用只与块大小有关
+        if fmt == "csv":
+            yield to_csv_text(df.iloc[:0], header=True)
+        for start in range(0, total, chunk):
+            part = df.iloc[start:start + chunk] if rows is None else df.iloc[rows[start:start + chunk]]
+            yield to_csv_text(part, header=False) if fmt == "csv" else to_ndjson(part)
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    resp = Response(stream_with_context(generate()), mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f"attachment; filename={dataset}.{fmt}"
+    resp.headers["X-Total-Count"] = str(total)
+    return resp
+
+
+# 预热 / 就绪检查覆盖的全部数据表
+WARM_TABLES = [(folder, fname) for folder, fname, _ in DATASETS.values()] + [
+    ("derived", "policy_timeline.csv"),
+    ("derived", "rollup_cube.csv"),  # 混合全部 grouping，只经 /api/rollup 按组合拆分后返回
+]
+
+
+# 预热 / 就绪检查覆盖的工件：(folder, name) → ArtifactStore
+WARM_ARTIFACTS = {
+    ("meta", "forecast_model.json"): scenario_models,
+    ("derived", "relation_cube.npz"): relation_cubes,
+}
+
+# 预热 / 就绪检查覆盖的派生对象：名称 → DerivedCache
+WARM_DERIVED = {"synergy_cube": synergy_cubes, "rollup_cube": rollup_cubes}
+
+
+def warm_store():
+    """加载全部数据表、工件（情景模型、相关矩阵）与由表派生的数组；生产模式下在 fork 之前调用，
+    返回缺失的表与工件 [(folder, name), ...]"""
+    missing = store.warm(WARM_TABLES)
+    missing += [key for key, artifacts in WARM_ARTIFACTS.items() if artifacts.get() is None]
+    combined = store.get("processed", "province_combined.csv")
+    if combined is not None:
+        cube = synergy_cubes.get(combined)
+        for mode in MODES:
+            cube.array(mode)
+    rollup = store.get("derived", "rollup_cube.csv")
+    if rollup is not None:
+        rollup_cubes.get(rollup)
+    return missing
+
+
+@app.route("/api/ready", methods=["GET"])
+def get_ready():
+    """就绪检查：warm_store 预热的数据表、工件与派生对象全部常驻内存时返回 200，否则 503"""
+    pending = [f"{folder}/{name}" for folder, name in WARM_TABLES if not store.is_loaded(folder, name)]
+    pending += [f"{folder}/{name}" for (folder, name), artifacts in WARM_ARTIFACTS.items()
+                if not artifacts.is_loaded()]
+    pending += [name for name, cache in WARM_DERIVED.items() if not cache.is_loaded()]
+    body = {"ready": not pending, "pending": pending, "pid": os.getpid()}
+    return jsonify(body), (200 if not pending else 503)
+
+
+@app.route("/api/store/stats", methods=["GET"])
+def get_store_stats():
+    """返回数据集注册表与响应缓存的命中 / 未命中 / 重载计数"""
+    stats = store.stats()
+    stats["response_cache"] = response_cache.stats()
+    return jsonify(stats)
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus 文本格式的请求指标，附带数据集注册表与响应缓存计数"""
+    st, rc = store.stats(), response_cache.stats()
+    extra = [
+        ("store_hits_total", "counter", "数据集注册表命中次数", st["hits"]),
+        ("store_misses_total", "counter", "数据集注册表首次加载次数", st["misses"]),
+        ("store_reloads_total", "counter", "数据集注册表因文件变化重载次数", st["reloads"]),
+        ("response_cache_hits_total", "counter", "响应缓存命中次数", rc["hits"]),
+        ("response_cache_misses_total", "counter", "响应缓存未命中次数", rc["misses"]),
+        ("response_cache_entries", "gauge", "响应缓存当前条目数", rc["size"]),
+        ("response_cache_bytes", "gauge", "响应缓存当前占用字节数（原文 + 压缩字节）", rc["bytes"]),
+        ("response_cache_evictions_total", "counter", "响应缓存因条目数或字节数超限淘汰的条目数", rc["evictions"]),
+    ]
+    return Response(request_metrics.render(extra), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,250 @@
+"""
+benchmark.py
+性能基准：
+- 以 data/province_raw 为模板生成放大 10× / 100× / 1000× 的合成原始数据
+  （复制省份并加扰动，同时向前延伸年份）；
+- 在合成数据上串行执行 process_all.py 全部阶段，记录各阶段用时与读写行数；
+- 用 Flask 测试客户端并发请求 app.py 的全部 GET 路由，统计吞吐量与 p50 / p99 延迟；
+- 结果写入 JSON 文件，便于跨版本对比。
+
+用法：cd backend && python benchmark.py --scales 10 100 --out benchmark_results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND = Path(__file__).resolve().parent
+DATA = BACKEND / "data"
+sys.path.insert(0, str(DATA))
+
+import process_all  # noqa: E402
+
+BASE_STAGES = list(process_all.STAGES)
+
+# 放大倍数 → (省份复制份数, 年份延伸倍数)
+SCALES = {1: (1, 1), 10: (10, 1), 100: (50, 2), 1000: (250, 4)}
+# 每段延伸的年数（覆盖原始数据 2003–2023）
+YEAR_SPAN = 21
+RAW_FILES = ["energy_raw.csv", "emission_raw.csv", "gdp_raw.csv", "population_raw.csv",
+             "green_raw.csv", "policy_events.csv"]
+
+# 路由 → 请求路径列表；{province} / {year} 以合成数据中的取值轮换填充
+ROUTE_QUERIES = {
+    "/api/relation": ["/api/relation", "/api/relation?window=3", "/api/relation?window=3&province={province}"],
+    "/api/scenario": ["/api/scenario?clean_delta=0.05&province={province}", "/api/scenario?green_ramp=0.01"],
+    "/api/bundle": ["/api/bundle?datasets=emission,energy,green&year={year}"],
+    "/api/export/<dataset>": ["/api/export/province", "/api/export/trend?format=csv"],
+    "/api/ready": ["/api/ready"],
+    "/api/store/stats": ["/api/store/stats"],
+    "/metrics": ["/metrics"],
+}
+DEFAULT_QUERIES = ["{rule}", "{rule}?province={province}", "{rule}?year={year}&format=columns"]
+
+
+# ===== 合成数据 =====
+def synthesize(dst, scale, seed=0):
+    """在 dst 下生成放大后的 province_raw，并复制 forecast 阶段所需的情景配置；返回各表行数"""
+    copies, year_factor = SCALES[scale]
+    rng = np.random.default_rng(seed)
+    raw = dst / "province_raw"
+    raw.mkdir(parents=True)
+    rows = {}
+    for name in RAW_FILES:
+        src = pd.read_csv(DATA / "province_raw" / name, encoding="utf-8-sig")
+        num = [c for c in src.columns if c not in ("province", "year") and pd.api.types.is_numeric_dtype(src[c])]
+        parts = []
+        for k in range(year_factor):
+            for i in range(copies):
+                part = src.copy()
+                if i:
+                    # 省份名保留原名前缀，normalize_province 处理后仍各自唯一
+                    part["province"] = part["province"].astype(str) + f"#{i}"
+                if k:
+                    part["year"] = part["year"] - k * YEAR_SPAN
+                if i or k:
+                    noise = rng.normal(1.0, 0.05, size=(len(part), len(num)))
+                    part[num] = part[num] * noise
+                parts.append(part)
+        df = pd.concat(parts, ignore_index=True)
+        if "clean_ratio" in df.columns:
+            df["clean_ratio"] = df["clean_ratio"].clip(0, 1)
+        if "green_rate" in df.columns:
+            df["green_rate"] = df["green_rate"].clip(0, 1)
+        df.to_csv(raw / name, index=False, encoding="utf-8-sig")
+        rows[name] = len(df)
+    (dst / "meta").mkdir()
+    shutil.copy(DATA / "meta" / "forecast_scenarios.json", dst / "meta" / "forecast_scenarios.json")
+    return rows
+
+
+def scaled_stages(scale):
+    """combined 阶段的起始年份随年份延伸前移，其余参数不变"""
+    _, year_factor = SCALES[scale]
+    stages = []
+    for s in BASE_STAGES:
+        if s.name == "combined":
+            s = s._replace(params=dict(s.params, year_min=s.params["year_min"] - (year_factor - 1) * YEAR_SPAN))
+        stages.append(s)
+    return stages
+
+
+# ===== 流水线 =====
+def bench_pipeline(base, scale, verbose=False):
+    process_all.set_base(base)
+    process_all.STAGES[:] = scaled_stages(scale)
+    out = sys.stdout if verbose else io.StringIO()
+    with contextlib.redirect_stdout(out):
+        process_all.ensure_dirs()
+        stats, wall = process_all.run_stages(force=True, jobs=1)
+    return {"wall_seconds": round(wall, 4), "stages": stats}
+
+
+# ===== 接口 =====
+def route_urls(app, provinces, years, per_route):
+    """为每条 GET 路由生成 per_route 个请求路径（省份 / 年份轮换）"""
+    urls = {}
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static" or "GET" not in rule.methods:
+            continue
+        templates = ROUTE_QUERIES.get(rule.rule, DEFAULT_QUERIES)
+        urls[rule.rule] = [templates[i % len(templates)].format(
+            rule=rule.rule, province=provinces[i % len(provinces)], year=years[i % len(years)])
+            for i in range(per_route)]
+    return urls
+
+
+def percentiles(latencies):
+    a = np.asarray(latencies) * 1000
+    return {"p50_ms": round(float(np.percentile(a, 50)), 3), "p99_ms": round(float(np.percentile(a, 99)), 3),
+            "mean_ms": round(float(a.mean()), 3), "max_ms": round(float(a.max()), 3)}
+
+
+def bench_api(per_route, concurrency, no_cache):
+    """在子进程中执行（LOWCARBON_DATA_DIR 已指向合成数据）"""
+    import app as api
+
+    if no_cache:
+        api.response_cache.maxsize = 0
+    t0 = time.perf_counter()
+    missing = api.warm_store()
+    warm = time.perf_counter() - t0
+    comb = api.store.load("processed", "province_combined.csv")
+    rng = np.random.default_rng(0)
+    provinces = list(rng.permutation(comb["province"].unique()))
+    years = list(rng.permutation(comb["year"].unique()))
+    urls = route_urls(api.app, provinces, [int(y) for y in years], per_route)
+
+    def fetch(url):
+        client = api.app.test_client()
+        t = time.perf_counter()
+        resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+        size = len(resp.get_data())
+        return time.perf_counter() - t, resp.status_code, size
+
+    routes = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for rule, batch in urls.items():
+            t = time.perf_counter()
+            results = list(ex.map(fetch, batch))
+            elapsed = time.perf_counter() - t
+            statuses = {}
+            for _, status, _ in results:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            routes[rule] = {
+                "requests": len(results),
+                "throughput_rps": round(len(results) / elapsed, 1),
+                **percentiles([r[0] for r in results]),
+                "mean_bytes": int(np.mean([r[2] for r in results])),
+                "status": statuses,
+            }
+    return {"warm_seconds": round(warm, 4), "missing": [f"{f}/{n}" for f, n in missing],
+            "concurrency": concurrency, "response_cache": not no_cache, "routes": routes}
+
+
+def set_data_dir(path):
+    os.environ["LOWCARBON_DATA_DIR"] = str(path)
+
+
+def run_api(base, per_route, concurrency, no_cache):
+    """每个规模在新的解释器中导入 app，使模块级数据目录与缓存互不干扰"""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=set_data_dir, initargs=(base,)) as ex:
+        return ex.submit(bench_api, per_route, concurrency, no_cache).result()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流水线与接口性能基准")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000], choices=sorted(SCALES),
+                        help="数据放大倍数")
+    parser.add_argument("--out", default="benchmark_results.json", help="结果 JSON 路径")
+    parser.add_argument("--requests", type=int, default=200, help="每条路由的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求线程数")
+    parser.add_argument("--no-cache", action="store_true", help="禁用响应缓存，每次请求都执行过滤与序列化")
+    parser.add_argument("--skip-pipeline", action="store_true", help="只测接口（仍需执行流水线生成数据，但不计入结果）")
+    parser.add_argument("--skip-api", action="store_true", help="只测流水线")
+    parser.add_argument("--keep", action="store_true", help="保留生成的合成数据目录")
+    parser.add_argument("--verbose", action="store_true", help="输出流水线日志")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"requests": args.requests, "concurrency": args.concurrency, "no_cache": args.no_cache},
+        "scales": [],
+    }
+    for scale in args.scales:
+        base = Path(tempfile.mkdtemp(prefix=f"lowcarbon_bench_{scale}x_"))
+        try:
+            print(f"📦 {scale}× 生成合成数据 ...")
+            entry = {"scale": scale, "raw_rows": synthesize(base, scale)}
+            print(f"⚙️ {scale}× 流水线 ...")
+            pipeline = bench_pipeline(base, scale, args.verbose)
+            if not args.skip_pipeline:
+                entry["pipeline"] = pipeline
+                print(f"   总用时 {pipeline['wall_seconds']:.2f}s")
+            if not args.skip_api:
+                print(f"🌐 {scale}× 接口 ...")
+                entry["api"] = run_api(base, args.requests, args.concurrency, args.no_cache)
+                for rule, r in entry["api"]["routes"].items():
+                    print(f"   {rule:<28}{r['throughput_rps']:>9.1f} rps  p50 {r['p50_ms']:>8.2f}ms"
+                          f"  p99 {r['p99_ms']:>8.2f}ms")
+            report["scales"].append(entry)
+        finally:
+            if args.keep:
+                print(f"   合成数据保留在 {base}")
+            else:
+                shutil.rmtree(base, ignore_errors=True)
+
+    Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"✅ 结果已写入 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,54 @@
 """
 process_all_v4_final_fixed.py
-版本：v4.4
+版本：v4.5
 更新说明：
 - 替换 ElasticNet 为 LinearRegression，解决预测值恒定问题；
 - 保留标准化、插值与均值填充；
 - 输出结构严格符合系统方案要求；
-- 保留日志输出与容错逻辑。
+- 保留日志输出与容错逻辑；
+- 流水线拆分为声明输入 / 输出的阶段，按原始文件内容哈希与阶段参数增量重建，
+  阶段图与缓存清单写入 meta/pipeline_stages.json、meta/pipeline_manifest.json；
+- 预测情景改由 meta/forecast_scenarios.json 配置（增量 / 逐年爬坡 / 上下限），
+  (省份 × 年份 × 情景) 网格一次 transform、一次 predict；
+- 拟合后的模型以 JSON 工件写入 meta/forecast_model.json，供 /api/scenario 即时推演；
+- 安装 pyarrow 时，processed / derived 各表额外输出同名 .feather（显式列类型、未压缩），
+  供后端内存映射读取；
+- 相关分析改为矩累加 + 滑动窗口的向量化引擎，输出 derived/relation_cube.npz
+  （混合截面与分省时间序列两类相关矩阵，窗口可配置）；
+- 聚类扩展为逐年轨迹：候选 k 各自按年份热启动 KMeans 并计算轮廓系数，
+  输出 derived/cluster_trajectory.csv、derived/cluster_silhouette.csv；
+- 阶段依赖由输入 / 输出推导，互不依赖的阶段可在进程池中并发执行（--jobs N），
+  各阶段用时打印并记入缓存清单；
+- --profile 重算全部阶段，逐阶段记录用时、CPU、峰值内存增量与读写行数，
+  写入 meta/pipeline_profile.json，--compare 可与上一次（或指定）报告对比；
+- --verify 在流水线结束后调用 verify_data_quality.validate 作为质量闸门；
+- 新增汇总立方体 derived/rollup_cube.csv：按 地区（东 / 中 / 西部）、省份、年份、聚类类型
+  的全部组合预先汇总 emission_per_gdp / clean_ratio / green_rate 的和、均值与 GDP 加权均值。
 """
 
-import os, json
+import os, sys, json, time, argparse, hashlib, inspect, multiprocessing
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import repeat
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # 可选依赖：未安装时只输出 CSV
+    pa = feather = None
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块，剖析报告不含峰值内存
+    resource = None
 
 # ===== 路径配置 =====
 BASE = Path(r"D:\coding\project\lowcarbon_visualization\backend\data")
@@ -23,10 +57,27 @@ PROC = BASE / "processed"
 DER  = BASE / "derived"
 META = BASE / "meta"
 
+def set_base(base):
+    """切换数据根目录；并行执行时作为子进程初始化函数，保证与主进程路径一致"""
+    global BASE, RAW, PROC, DER, META
+    BASE = Path(base)
+    RAW, PROC, DER, META = BASE / "province_raw", BASE / "processed", BASE / "derived", BASE / "meta"
+
 YEARS_COMBINED = range(2005, 2023)
 YEARS_EMI_EN   = range(2003, 2023)
 YEARS_GREEN    = range(2005, 2024)
 
+STAGES_FILE   = "pipeline_stages.json"
+MANIFEST_FILE = "pipeline_manifest.json"
+PROFILE_FILE  = "pipeline_profile.json"
+
+# 当前进程内各阶段的读写计数（run_stage 开始时清零）
+IO_STATS = dict.fromkeys(["read_seconds", "read_rows", "write_seconds", "write_rows"], 0)
+
+def count_io(kind, t0, rows):
+    IO_STATS[f"{kind}_seconds"] += time.perf_counter() - t0
+    IO_STATS[f"{kind}_rows"] += rows
+
 def ensure_dirs():
     for d in [PROC, DER, META]:
         d.mkdir(parents=True, exist_ok=True)
@@ -44,13 +95,69 @@ def normalize_province(s):
 
 def load_csv(name):
     p = RAW / name
+    t0 = time.perf_counter()
     df = pd.read_csv(p)
+    count_io("read", t0, len(df))
     if "province" in df.columns:
         df["province"] = df["province"].map(normalize_province)
     if "year" in df.columns:
         df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
     return df
 
+def load_numeric(name):
+    """读取原始表，并将 province / year 以外的字段转为数值"""
+    df = load_csv(name)
+    for c in df.columns:
+        if c not in ["province","year"]:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
+
+def path_of(rel):
+    """阶段声明中的相对路径（如 processed/x.csv）→ 绝对路径"""
+    return BASE / rel
+
+def read_table(rel):
+    """读取上游阶段的输出"""
+    t0 = time.perf_counter()
+    df = pd.read_csv(path_of(rel), encoding="utf-8-sig")
+    count_io("read", t0, len(df))
+    return df
+
+def binary_rel(rel):
+    """CSV 输出对应的 Feather 路径（同名 .feather）"""
+    return rel.rsplit(".", 1)[0] + ".feather"
+
+def to_arrow_table(df):
+    """显式列类型：province 分类、year int16、浮点指标 float64（与 CSV 取值逐位一致，
+    汇总立方体的大额 _sum 列也不损失精度）；浮点 NaN 按值写入而非 null，读取端可零拷贝映射"""
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        if c == "province":
+            cols[c] = pa.array(s.astype("category"))
+        elif c == "year":
+            cols[c] = pa.array(s.to_numpy("int16") if s.notna().all() else s.astype("Int16"))
+        elif s.dtype.kind == "f":
+            cols[c] = pa.array(s.to_numpy("float64"), from_pandas=False)
+        else:
+            cols[c] = pa.array(s, from_pandas=True)
+    return pa.table(cols)
+
+def replace_atomic(path, write):
+    """先写临时文件再原子替换，正在内存映射旧文件的读取方不受影响"""
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+def write_table(df, rel):
+    t0 = time.perf_counter()
+    replace_atomic(path_of(rel), lambda p: df.to_csv(p, index=False, encoding="utf-8-sig"))
+    if feather is not None and rel.endswith(".csv"):
+        table = to_arrow_table(df)
+        replace_atomic(path_of(binary_rel(rel)),
+                       lambda p: feather.write_feather(table, p, compression="uncompressed"))
+    count_io("write", t0, len(df))
+
 def fossil_from_clean(df):
     df["fossil_ratio"] = 1 - df["clean_ratio"]
     df["fossil_ratio"] = df["fossil_ratio"].clip(0,1)
@@ -62,42 +169,61 @@ def zscore_by_year(df, cols):
         out[c+"_z"] = out.groupby("year")[c].transform(lambda x: (x-x.mean())/x.std(ddof=0))
     return out
 
-def main():
-    ensure_dirs()
-    print("🚀 数据处理开始...")
-    emission = load_csv("emission_raw.csv")
-    energy   = load_csv("energy_raw.csv")
-    green    = load_csv("green_raw.csv")
-    gdp      = load_csv("gdp_raw.csv")
-    pop      = load_csv("population_raw.csv")
-    policy   = load_csv("policy_events.csv")
-
-    for df in [emission,energy,green,gdp,pop]:
-        for c in df.columns:
-            if c not in ["province","year"]:
-                df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    energy = fossil_from_clean(energy)
+def grouped_ols(codes, x, y, n_groups):
+    """分组一元最小二乘的闭式解：对每组一次性求 slope / intercept / 样本数。
+    方差为 0 的组退化为常数模型（与 LinearRegression 的最小范数解一致）"""
+    n  = np.bincount(codes, minlength=n_groups).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = np.bincount(codes, weights=x, minlength=n_groups) / n
+        my = np.bincount(codes, weights=y, minlength=n_groups) / n
+        dx, dy = x - mx[codes], y - my[codes]
+        sxx = np.bincount(codes, weights=dx*dx, minlength=n_groups)
+        sxy = np.bincount(codes, weights=dx*dy, minlength=n_groups)
+        slope = np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1), 0.0)
+    return slope, my - slope*mx, n
 
-    # --- 排放外推 ---
+def extrapolate_emission(energy, emission, years, min_obs):
+    """以 能耗×化石能源占比 为驱动量，按省份拟合排放并外推到 years；
+    全部省份一次拟合、全部目标行一次预测"""
     merged = (
         energy[["province","year","total_energy_consumption_std_coal_mt","fossil_ratio"]]
         .merge(emission,on=["province","year"],how="left")
     )
-    out_rows=[]
-    for p,g in merged.groupby("province"):
-        g=g.dropna(subset=["emission_total_mt","total_energy_consumption_std_coal_mt"])
-        if len(g)<8: continue
-        X=g[["total_energy_consumption_std_coal_mt","fossil_ratio"]].prod(axis=1).values.reshape(-1,1)
-        y=g["emission_total_mt"].values
-        m=LinearRegression().fit(X,y)
-        for yv in [2020,2021,2022]:
-            row=energy.query("province==@p and year==@yv")
-            if not row.empty:
-                driver=(row["total_energy_consumption_std_coal_mt"]*row["fossil_ratio"]).values
-                pred=m.predict(driver.reshape(-1,1))
-                out_rows.append([p,yv,float(pred[0]),1])
-    extra=pd.DataFrame(out_rows,columns=["province","year","emission_total_mt","is_imputed_emission"])
+    fit = merged.dropna(subset=["province","emission_total_mt","total_energy_consumption_std_coal_mt"])
+    # 驱动量与 DataFrame.prod(axis=1) 口径一致：fossil_ratio 缺失时按 1 计
+    x = (fit["total_energy_consumption_std_coal_mt"]*fit["fossil_ratio"].fillna(1)).to_numpy(float)
+    codes, provinces = pd.factorize(fit["province"])
+    slope, intercept, n = grouped_ols(codes, x, fit["emission_total_mt"].to_numpy(float), len(provinces))
+    model = pd.DataFrame({"province": provinces, "slope": slope, "intercept": intercept})[n >= min_obs]
+
+    years = list(years)
+    target = energy[energy["year"].isin(years)].drop_duplicates(["province","year"])
+    target = target.merge(model, on="province", how="inner")
+    target["emission_total_mt"] = target["intercept"] + target["slope"]*(
+        target["total_energy_consumption_std_coal_mt"]*target["fossil_ratio"])
+    target = target.dropna(subset=["emission_total_mt"])
+    # 输出顺序：省份升序，年份按 years 给定顺序
+    target["_order"] = target["year"].map({y: i for i, y in enumerate(years)})
+    target = target.sort_values(["province","_order"], kind="stable")
+    extra = target[["province","year","emission_total_mt"]].reset_index(drop=True)
+    extra["year"] = extra["year"].astype("int64")
+    extra["is_imputed_emission"] = 1
+    return extra
+
+# ===== 各阶段 =====
+def stage_energy():
+    energy = fossil_from_clean(load_numeric("energy_raw.csv"))
+    write_table(energy.loc[:,["province","year","clean_ratio","fossil_ratio","total_energy_consumption_std_coal_mt"]],
+                "processed/province_energy.csv")
+
+def stage_emission(extrapolate_years, min_obs):
+    emission = load_numeric("emission_raw.csv")
+    gdp      = load_numeric("gdp_raw.csv")
+    pop      = load_numeric("population_raw.csv")
+    energy   = read_table("processed/province_energy.csv")
+
+    # --- 排放外推 ---
+    extra=extrapolate_emission(energy, emission, extrapolate_years, min_obs)
     emission["is_imputed_emission"]=0
     emission=pd.concat([emission,extra],ignore_index=True)
 
@@ -107,63 +233,292 @@ def main():
     merged["per_capita_t"]=(merged["emission_total_mt"]*1e6)/(merged["population_million"]*1e6)
     emi=merged.loc[:,["province","year","emission_total_mt","emission_per_gdp","per_capita_t","is_imputed_emission"]].copy()
     emi.rename(columns={"emission_total_mt":"emission_total"}, inplace=True)
-    emi.to_csv(PROC/"province_emission.csv",index=False,encoding="utf-8-sig")
+    write_table(emi, "processed/province_emission.csv")
 
-    energy.loc[:,["province","year","clean_ratio","fossil_ratio","total_energy_consumption_std_coal_mt"]].to_csv(
-        PROC/"province_energy.csv",index=False,encoding="utf-8-sig")
+def stage_green():
+    green = load_numeric("green_raw.csv")
     green.rename(columns={"forest_area_km2":"forest_area"},inplace=True)
-    green.loc[:,["province","year","green_rate","forest_area"]].to_csv(
-        PROC/"province_green.csv",index=False,encoding="utf-8-sig")
+    write_table(green.loc[:,["province","year","green_rate","forest_area"]], "processed/province_green.csv")
 
+def stage_combined(year_min, year_max):
+    emi    = read_table("processed/province_emission.csv")
+    energy = read_table("processed/province_energy.csv")
+    green  = read_table("processed/province_green.csv")
     comb=(emi.merge(energy,on=["province","year"],how="left")
              .merge(green,on=["province","year"],how="left"))
-    comb=comb[(comb["year"]>=2005)&(comb["year"]<=2022)]
-    comb.loc[:,["province","year","emission_per_gdp","clean_ratio","green_rate"]].to_csv(
-        PROC/"province_combined.csv",index=False,encoding="utf-8-sig")
+    comb=comb[(comb["year"]>=year_min)&(comb["year"]<=year_max)]
+    write_table(comb.loc[:,["province","year","emission_per_gdp","clean_ratio","green_rate"]],
+                "processed/province_combined.csv")
 
+def stage_standardized(weights):
     # --- Z-score + 协同指数 ---
+    comb = read_table("processed/province_combined.csv")
     std=zscore_by_year(comb,["clean_ratio","green_rate","emission_per_gdp"])
     std["energy_index"]=std["clean_ratio_z"]
     std["eco_index"]=std["green_rate_z"]
     std["efficiency_index"]=-std["emission_per_gdp_z"]
-    std["synergy_score"]=0.4*std["energy_index"]+0.3*std["eco_index"]+0.3*std["efficiency_index"]
-    std[["province","year","energy_index","eco_index","efficiency_index"]].to_csv(
-        DER/"province_standardized.csv",index=False,encoding="utf-8-sig")
-    std[["province","year","synergy_score"]].to_csv(
-        DER/"province_synergy_index.csv",index=False,encoding="utf-8-sig")
-
-    # --- 相关矩阵 ---
-    rels=[]
-    for y,g in comb.groupby("year"):
-        corr=g[["clean_ratio","green_rate","emission_per_gdp"]].corr()
-        for a in corr.columns:
-            for b in corr.columns:
-                rels.append({"year":int(y),"variable_x":a,"variable_y":b,"correlation":float(corr.loc[a,b])})
-    pd.DataFrame(rels).to_csv(DER/"province_relation.csv",index=False,encoding="utf-8-sig")
+    std["synergy_score"]=(weights["energy_index"]*std["energy_index"]+weights["eco_index"]*std["eco_index"]
+                          +weights["efficiency_index"]*std["efficiency_index"])
+    write_table(std[["province","year","energy_index","eco_index","efficiency_index"]],
+                "derived/province_standardized.csv")
+    write_table(std[["province","year","synergy_score"]], "derived/province_synergy_index.csv")
+
+def write_arrays(arrays, rel):
+    """写出 npz（未压缩，便于快速加载）"""
+    def save(p):
+        with open(p, "wb") as f:
+            np.savez(f, **arrays)
+    t0 = time.perf_counter()
+    replace_atomic(path_of(rel), save)
+    count_io("write", t0, 0)
+
+def grouped_moments(codes, n_cells, X):
+    """按 codes 分组累加成对完整观测（行内 i、j 同时非空）的矩：
+    n_ij、Σx_i、Σx_i²、Σx_i·x_j，返回形状 (n_cells, 4, V, V)"""
+    V = X.shape[1]
+    valid = ~np.isnan(X)
+    M = valid.astype(float)
+    Z = np.where(valid, X, 0.0)
+    out = np.zeros((n_cells, 4, V, V))
+    for k, (a, b) in enumerate([(M, M), (Z, M), (Z*Z, M), (Z, Z)]):
+        for i in range(V):
+            for j in range(V):
+                out[:, k, i, j] = np.bincount(codes, weights=a[:, i]*b[:, j], minlength=n_cells)
+    return out
+
+def rolling_sum(a, window):
+    """沿第 0 轴（年份）的滑动窗口求和；窗口不完整的位置为 NaN"""
+    cs = np.concatenate([np.zeros((1,)+a.shape[1:]), np.cumsum(a, axis=0)])
+    out = np.full(a.shape, np.nan)
+    out[window-1:] = cs[window:] - cs[:len(a)-window+1]
+    return out
+
+def corr_from_moments(m, min_obs):
+    """由成对矩计算 Pearson 相关系数；样本不足或方差为 0 时为 NaN。
+    Σx² − (Σx)²/n 对常数序列只剩舍入残差，故方差不超过 Σx² 的 1e-12 即按 0 处理（与 pandas 一致返回 NaN）"""
+    n, sx, sxx, sxy = m[..., 0, :, :], m[..., 1, :, :], m[..., 2, :, :], m[..., 3, :, :]
+    sy, syy = np.swapaxes(sx, -1, -2), np.swapaxes(sxx, -1, -2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx*sy/n
+        vx, vy = sxx - sx*sx/n, syy - sy*sy/n
+        corr = cov / np.sqrt(vx*vy)
+        degenerate = ~(vx > 1e-12*sxx) | ~(vy > 1e-12*syy)
+    corr[(n < min_obs) | degenerate] = np.nan
+    return np.clip(corr, -1, 1)
+
+def correlation_cube(comb, variables, windows, min_obs):
+    """一次性计算所有滑动窗口的相关矩阵：
+    pooled[k, y, i, j]        —— 窗口 windows[k]、截至年份 y 的全部省份混合样本；
+    by_province[k, y, p, i, j] —— 同一窗口内各省份自身的时间序列相关"""
+    comb = comb.dropna(subset=["province","year"])
+    years = np.arange(int(comb["year"].min()), int(comb["year"].max())+1)
+    p_codes, provinces = pd.factorize(comb["province"], sort=True)
+    y_codes = comb["year"].to_numpy(int) - years[0]
+    P = len(provinces)
+    cells = grouped_moments(y_codes*P + p_codes, len(years)*P, comb[variables].to_numpy(float))
+    cells = cells.reshape((len(years), P) + cells.shape[1:])
+    pooled, by_province = [], []
+    for w in windows:
+        pooled.append(corr_from_moments(rolling_sum(cells.sum(axis=1), w), min_obs))
+        by_province.append(corr_from_moments(rolling_sum(cells, w), min_obs))
+    return years, np.asarray(provinces, dtype=str), np.stack(pooled), np.stack(by_province)
 
+def stage_relation(variables, windows, min_obs):
+    # --- 相关矩阵（全部窗口向量化计算） ---
+    comb = read_table("processed/province_combined.csv")
+    windows = sorted(set(windows) | {1})
+    years, provinces, pooled, by_province = correlation_cube(comb, variables, windows, min_obs)
+    write_arrays({"years": years, "variables": np.asarray(variables, dtype=str),
+                  "windows": np.asarray(windows), "min_obs": np.asarray(min_obs), "provinces": provinces,
+                  "pooled": pooled, "by_province": by_province}, "derived/relation_cube.npz")
+
+    # 逐年截面相关（窗口 1），保持原有长表格式
+    k = windows.index(1)
+    present = np.sort(comb["year"].dropna().unique().astype(int)) - years[0]
+    V = len(variables)
+    write_table(pd.DataFrame({
+        "year": np.repeat(years[present], V*V),
+        "variable_x": np.tile(np.repeat(variables, V), len(present)),
+        "variable_y": np.tile(variables, V*len(present)),
+        "correlation": pooled[k, present].ravel(),
+    }), "derived/province_relation.csv")
+
+def stage_trend():
+    comb = read_table("processed/province_combined.csv")
     trend=comb[["province","year","clean_ratio","green_rate","emission_per_gdp"]].copy()
-    trend.to_csv(DER/"province_trend.csv",index=False,encoding="utf-8-sig")
+    write_table(trend, "derived/province_trend.csv")
 
     delta=trend.sort_values(["province","year"]).copy()
     delta["Δenergy"]=delta.groupby("province")["clean_ratio"].diff()
     delta["Δgreen"]=delta.groupby("province")["green_rate"].diff()
     delta["Δemission"]=delta.groupby("province")["emission_per_gdp"].diff()
-    delta.to_csv(DER/"province_delta.csv",index=False,encoding="utf-8-sig")
+    write_table(delta, "derived/province_delta.csv")
 
+def stage_policy():
+    policy = load_csv("policy_events.csv")
     keep=[c for c in ["province","year","policy_name","category","level"] if c in policy.columns]
-    policy[keep].drop_duplicates().to_csv(DER/"policy_timeline.csv",index=False,encoding="utf-8-sig")
+    write_table(policy[keep].drop_duplicates(), "derived/policy_timeline.csv")
+
+CLUSTER_FEATURES = ["energy_index","eco_index","efficiency_index"]
+
+def cluster_chain(k, panels, n_init, random_state):
+    """单个 k 的逐年聚类：首年冷启动（n_init 次），之后每年以上一年质心热启动（n_init=1），
+    类别编号因此在年份间保持对应"""
+    labels, scores = [], []
+    centers = None
+    for year, provinces, X in panels:
+        if len(X) <= k:
+            continue
+        if centers is None:
+            km = KMeans(n_clusters=k, n_init=n_init, random_state=random_state).fit(X)
+        else:
+            km = KMeans(n_clusters=k, init=centers, n_init=1, random_state=random_state).fit(X)
+        centers = km.cluster_centers_
+        sil = silhouette_score(X, km.labels_) if len(np.unique(km.labels_)) > 1 else np.nan
+        labels.append(pd.DataFrame({"province": provinces, "year": year, "k": k, "cluster_type": km.labels_}))
+        scores.append({"year": year, "k": k, "silhouette": float(sil), "inertia": float(km.inertia_)})
+    return labels, scores
+
+def cluster_trajectory(std, ks, n_init, random_state):
+    """全部年份 × 候选 k 的聚类轨迹；各 k 的年份链相互独立，分派到多个进程并行"""
+    panels = [(int(y), g["province"].to_numpy(), g[CLUSTER_FEATURES].to_numpy(float))
+              for y, g in std.dropna(subset=CLUSTER_FEATURES).groupby("year")]
+    jobs = min(len(ks), os.cpu_count() or 1)
+    args = (ks, repeat(panels), repeat(n_init), repeat(random_state))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(cluster_chain, *args))
+    else:
+        results = list(map(cluster_chain, *args))
+    labels = pd.concat([df for lab, _ in results for df in lab], ignore_index=True)
+    scores = pd.DataFrame([row for _, sc in results for row in sc])
+    return labels, scores
 
+def stage_cluster(year, n_clusters, n_init, random_state, trajectory_ks):
     # --- 聚类 ---
-    latest=std.query("year==2022")[["province","energy_index","eco_index","efficiency_index","synergy_score"]].dropna()
-    km=KMeans(n_clusters=4,n_init=10,random_state=42).fit(latest[["energy_index","eco_index","efficiency_index"]])
+    std = read_table("derived/province_standardized.csv")
+    # 两表由同一阶段按相同行序写出
+    std["synergy_score"] = read_table("derived/province_synergy_index.csv")["synergy_score"].values
+    latest=std.query("year==@year")[["province","energy_index","eco_index","efficiency_index","synergy_score"]].dropna()
+    km=KMeans(n_clusters=n_clusters,n_init=n_init,random_state=random_state).fit(latest[["energy_index","eco_index","efficiency_index"]])
     latest["cluster_type"]=km.labels_
-    latest.to_csv(DER/"cluster_result.csv",index=False,encoding="utf-8-sig")
-    (latest.groupby("cluster_type")[["energy_index","eco_index","efficiency_index","synergy_score"]]
-           .mean().reset_index()
-           .rename(columns={"energy_index":"mean_energy","eco_index":"mean_eco","efficiency_index":"mean_efficiency"}))\
-           .to_csv(DER/"cluster_summary.csv",index=False,encoding="utf-8-sig")
+    write_table(latest, "derived/cluster_result.csv")
+    write_table(latest.groupby("cluster_type")[["energy_index","eco_index","efficiency_index","synergy_score"]]
+                      .mean().reset_index()
+                      .rename(columns={"energy_index":"mean_energy","eco_index":"mean_eco","efficiency_index":"mean_efficiency"}),
+                "derived/cluster_summary.csv")
+
+    # --- 逐年聚类轨迹 + 轮廓系数（用于选择 k） ---
+    labels, scores = cluster_trajectory(std, trajectory_ks, n_init, random_state)
+    write_table(labels, "derived/cluster_trajectory.csv")
+    write_table(scores, "derived/cluster_silhouette.csv")
+
+# --- 汇总立方体 ---
+ROLLUP_DIMS = ["region","province","year","cluster_type"]
+
+def grouping_sets():
+    """全部维度组合；省份唯一决定地区与聚类类型，含省份的组合只保留 province[,year]"""
+    sets = []
+    for mask in range(1 << len(ROLLUP_DIMS)):
+        dims = [d for i, d in enumerate(ROLLUP_DIMS) if mask >> i & 1]
+        if "province" in dims and dims != [d for d in ROLLUP_DIMS if d in ("province","year") and d in dims]:
+            continue
+        sets.append(dims)
+    return sorted(sets, key=len)
+
+def stage_rollup(metrics, regions):
+    comb = read_table("processed/province_combined.csv")
+    gdp = load_numeric("gdp_raw.csv")[["province","year","gdp_billion_cny"]].dropna().drop_duplicates(["province","year"])
+    # 聚类类型取基准年（cluster 阶段的 year 参数）的类别并用于全部年份，使省份唯一决定聚类类型；
+    # 逐年类别另见 cluster_trajectory.csv
+    cluster = read_table("derived/cluster_result.csv")[["province","cluster_type"]]
+    df = comb.merge(gdp, on=["province","year"], how="left").merge(cluster, on="province", how="left")
+    # 地区按省名前两字匹配（兼容 "内蒙" / "黑龙" 等截断名称）
+    prefix = {p[:2]: r for r, ps in regions.items() for p in ps}
+    df["region"] = df["province"].str[:2].map(prefix).fillna("其他")
+    df["cluster_type"] = df["cluster_type"].fillna(-1).astype(int)
+
+    # 逐指标预先算好 值 / 值×GDP / 有效 GDP，各组合只做一次 groupby 求和
+    parts = {"n": np.ones(len(df))}
+    for m in metrics:
+        v, w = df[m], df["gdp_billion_cny"].where(df[m].notna())
+        parts[f"{m}_sum"] = v
+        parts[f"{m}_cnt"] = v.notna().astype(float)
+        parts[f"{m}_wx"] = v * w
+        parts[f"{m}_w"] = w
+    parts["gdp_sum"] = df["gdp_billion_cny"]
+    vals = pd.DataFrame(parts)
 
+    frames = []
+    for dims in grouping_sets():
+        keys = dims + (["region","cluster_type"] if "province" in dims else [])
+        agg = (vals.groupby([df[k] for k in keys], sort=True).sum(min_count=1) if keys
+               else vals.sum(min_count=1).to_frame().T)
+        agg = agg.reset_index(drop=not keys)
+        agg.insert(0, "grouping", ",".join(dims) or "all")
+        frames.append(agg)
+    cube = pd.concat(frames, ignore_index=True)
+    for m in metrics:
+        cube[f"{m}_mean"] = cube[f"{m}_sum"] / cube[f"{m}_cnt"]
+        cube[f"{m}_wmean"] = cube[f"{m}_wx"] / cube[f"{m}_w"]
+    cube["n"] = cube["n"].astype(int)
+    cols = (["grouping"] + ROLLUP_DIMS + ["n","gdp_sum"]
+            + [f"{m}_{a}" for m in metrics for a in ("sum","mean","wmean")])
+    write_table(cube.reindex(columns=cols), "derived/rollup_cube.csv")
+
+def load_scenarios(rel):
+    """读取情景配置：每个情景可设 *_delta（一次性增量）、*_ramp（每年追加增量）、
+    *_floor / *_cap（取值下限 / 上限，默认 0 / 1），* 为 clean 或 green"""
+    cfg = json.loads(path_of(rel).read_text(encoding="utf-8"))
+    scen = pd.DataFrame(cfg["scenarios"])
+    for v in ["clean","green"]:
+        for k, default in [("delta",0.0),("ramp",0.0),("floor",0.0),("cap",1.0)]:
+            col = f"{v}_{k}"
+            scen[col] = scen[col].fillna(default) if col in scen.columns else default
+    years = np.arange(cfg["start_year"], cfg["end_year"]+1)
+    return int(cfg["base_year"]), years, scen
+
+def scenario_grid(base, years, base_year, scen):
+    """构造 (省份 × 年份 × 情景) 网格，返回按该顺序展平的 clean / green 数组"""
+    t = (years - base_year)[None, :, None]
+    out = []
+    for v, col in [("clean","clean_ratio"),("green","green_rate")]:
+        val = (base[col].to_numpy(float)[:, None, None]
+               + scen[f"{v}_delta"].to_numpy(float)[None, None, :]
+               + scen[f"{v}_ramp"].to_numpy(float)[None, None, :]*t)
+        val = np.clip(val, scen[f"{v}_floor"].to_numpy(float), scen[f"{v}_cap"].to_numpy(float))
+        out.append(val.ravel())
+    return out
+
+MODEL_FORMAT = 1
+
+def save_model_artifact(rel, scaler, model, last, base_year, years):
+    """持久化拟合好的 StandardScaler + LinearRegression 及基准年取值（纯 JSON，供 /api/scenario 使用）；
+    version 为模型内容哈希，模型不变则版本不变"""
+    body = {
+        "format": MODEL_FORMAT,
+        "features": ["clean_ratio","green_rate"],
+        "target": "predicted_emission_per_gdp",
+        "scaler": {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()},
+        "model": {"coef": model.coef_.tolist(), "intercept": float(model.intercept_)},
+        "base_year": base_year,
+        "start_year": int(years[0]),
+        "end_year": int(years[-1]),
+        "baseline": {
+            "province": last["province"].tolist(),
+            "clean_ratio": last["clean_ratio"].astype(float).tolist(),
+            "green_rate": last["green_rate"].astype(float).tolist(),
+        },
+    }
+    text = json.dumps(body, ensure_ascii=False, sort_keys=True)
+    body = {"version": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], **body}
+    text = json.dumps(body, ensure_ascii=False, indent=2)
+    # 原子替换：接口进程在写入途中读取时仍拿到完整的旧文件
+    replace_atomic(path_of(rel), lambda p: p.write_text(text, encoding="utf-8"))
+
+def stage_forecast(config):
     # --- 预测模型（LinearRegression 改进版） ---
+    trend = read_table("derived/province_trend.csv")
     trend["clean_ratio"] = trend.groupby("province")["clean_ratio"].transform(lambda x: x.interpolate(limit=3))
     trend["green_rate"]  = trend.groupby("province")["green_rate"].transform(lambda x: x.interpolate(limit=3))
     trend.fillna(trend.mean(numeric_only=True), inplace=True)
@@ -173,42 +528,370 @@ def main():
     scaler = StandardScaler().fit(X)
     model = LinearRegression().fit(scaler.transform(X), y)
 
-    last22 = trend.query("year==2022")[["province","clean_ratio","green_rate"]].dropna()
-    rows = []
-    for _, r in last22.iterrows():
-        for year in range(2023, 2031):
-            for scen, dc, dg in [("baseline", 0, 0), ("clean_plus5pp", 0.05, 0), ("green_plus2pp", 0.02, 0.02)]:
-                clean = np.clip(r.clean_ratio + dc, 0, 1)
-                green = np.clip(r.green_rate + dg, 0, 1)
-                try:
-                    pred = float(model.predict(scaler.transform([[clean, green]]))[0])
-                    rows.append([r.province, year, scen, clean, green, pred])
-                except Exception as e:
-                    print(f"⚠️ 跳过 {r.province}-{year} ({scen}) 原因: {e}")
-                    continue
+    # --- 情景网格：一次 transform + 一次 predict ---
+    base_year, years, scen = load_scenarios(config)
+    last = trend.query("year==@base_year")[["province","clean_ratio","green_rate"]].dropna()
+    clean, green = scenario_grid(last, years, base_year, scen)
+    pred = model.predict(scaler.transform(np.column_stack([clean, green])))
+
+    save_model_artifact("meta/forecast_model.json", scaler, model, last, base_year, years)
 
-    pd.DataFrame(rows, columns=["province","year","scenario_name","clean_ratio","green_rate","predicted_emission_per_gdp"])\
-        .to_csv(DER/"model_output.csv", index=False, encoding="utf-8-sig")
+    P, Y, S = len(last), len(years), len(scen)
+    write_table(pd.DataFrame({
+        "province": np.repeat(last["province"].to_numpy(), Y*S),
+        "year": np.tile(np.repeat(years, S), P),
+        "scenario_name": np.tile(scen["name"].to_numpy(), P*Y),
+        "clean_ratio": clean,
+        "green_rate": green,
+        "predicted_emission_per_gdp": pred,
+    }), "derived/model_output.csv")
 
+def stage_meta(src_info, var_dict):
     # --- Meta 信息 ---
-    META.mkdir(exist_ok=True)
-    src_info={
-        "CEADs":"省级CO₂排放（2003–2019）+ 模型外推2020–2022",
-        "国家能源年鉴":"能源结构与清洁能源比例",
-        "住建部/统计局":"城市绿化数据",
-        "统计年鉴":"GDP与人口",
-        "note":"所有比例已归一化至0–1，字段含义详见 variable_dict.json"
-    }
     (META/"data_sources.json").write_text(json.dumps(src_info,ensure_ascii=False,indent=2),encoding="utf-8")
-    var_dict={
-        "province":"省份","year":"年份","clean_ratio":"清洁能源占比","green_rate":"建成区绿化覆盖率",
-        "emission_per_gdp":"单位GDP排放","energy_index":"能源标准化","eco_index":"绿化标准化",
-        "efficiency_index":"效率标准化(-z)","synergy_score":"协同指数","cluster_type":"聚类类型",
-        "Δenergy":"清洁能源年变动","Δgreen":"绿化率年变动","Δemission":"排放强度年变动",
-        "predicted_emission_per_gdp":"模型预测值"
-    }
     (META/"variable_dict.json").write_text(json.dumps(var_dict,ensure_ascii=False,indent=2),encoding="utf-8")
 
+# ===== 阶段图 =====
+# inputs / outputs 为相对 BASE 的路径；上游阶段的输出即下游阶段的输入
+Stage = namedtuple("Stage", ["name", "func", "inputs", "outputs", "params"])
+
+STAGES = [
+    Stage("energy", stage_energy,
+          ["province_raw/energy_raw.csv"],
+          ["processed/province_energy.csv"], {}),
+    Stage("emission", stage_emission,
+          ["province_raw/emission_raw.csv", "province_raw/gdp_raw.csv", "province_raw/population_raw.csv",
+           "processed/province_energy.csv"],
+          ["processed/province_emission.csv"],
+          {"extrapolate_years": [2020, 2021, 2022], "min_obs": 8}),
+    Stage("green", stage_green,
+          ["province_raw/green_raw.csv"],
+          ["processed/province_green.csv"], {}),
+    Stage("combined", stage_combined,
+          ["processed/province_emission.csv", "processed/province_energy.csv", "processed/province_green.csv"],
+          ["processed/province_combined.csv"],
+          {"year_min": 2005, "year_max": 2022}),
+    Stage("standardized", stage_standardized,
+          ["processed/province_combined.csv"],
+          ["derived/province_standardized.csv", "derived/province_synergy_index.csv"],
+          {"weights": {"energy_index": 0.4, "eco_index": 0.3, "efficiency_index": 0.3}}),
+    Stage("relation", stage_relation,
+          ["processed/province_combined.csv"],
+          ["derived/province_relation.csv", "derived/relation_cube.npz"],
+          {"variables": ["clean_ratio", "green_rate", "emission_per_gdp"], "windows": [1, 3, 5], "min_obs": 3}),
+    Stage("trend", stage_trend,
+          ["processed/province_combined.csv"],
+          ["derived/province_trend.csv", "derived/province_delta.csv"], {}),
+    Stage("policy", stage_policy,
+          ["province_raw/policy_events.csv"],
+          ["derived/policy_timeline.csv"], {}),
+    Stage("cluster", stage_cluster,
+          ["derived/province_standardized.csv", "derived/province_synergy_index.csv"],
+          ["derived/cluster_result.csv", "derived/cluster_summary.csv",
+           "derived/cluster_trajectory.csv", "derived/cluster_silhouette.csv"],
+          {"year": 2022, "n_clusters": 4, "n_init": 10, "random_state": 42, "trajectory_ks": [2, 3, 4, 5, 6]}),
+    Stage("rollup", stage_rollup,
+          ["processed/province_combined.csv", "province_raw/gdp_raw.csv", "derived/cluster_result.csv"],
+          ["derived/rollup_cube.csv"],
+          {"metrics": ["emission_per_gdp", "clean_ratio", "green_rate"],
+           "regions": {
+               "东部": ["北京","天津","河北","辽宁","上海","江苏","浙江","福建","山东","广东","海南"],
+               "中部": ["山西","吉林","黑龙江","安徽","江西","河南","湖北","湖南"],
+               "西部": ["内蒙古","广西","重庆","四川","贵州","云南","西藏","陕西","甘肃","青海","宁夏","新疆"],
+           }}),
+    Stage("forecast", stage_forecast,
+          ["derived/province_trend.csv", "meta/forecast_scenarios.json"],
+          ["derived/model_output.csv", "meta/forecast_model.json"],
+          {"config": "meta/forecast_scenarios.json"}),
+    Stage("meta", stage_meta, [],
+          ["meta/data_sources.json", "meta/variable_dict.json"],
+          {"src_info": {
+               "CEADs":"省级CO₂排放（2003–2019）+ 模型外推2020–2022",
+               "国家能源年鉴":"能源结构与清洁能源比例",
+               "住建部/统计局":"城市绿化数据",
+               "统计年鉴":"GDP与人口",
+               "note":"所有比例已归一化至0–1，字段含义详见 variable_dict.json"
+           },
+           "var_dict": {
+               "province":"省份","year":"年份","clean_ratio":"清洁能源占比","green_rate":"建成区绿化覆盖率",
+               "emission_per_gdp":"单位GDP排放","energy_index":"能源标准化","eco_index":"绿化标准化",
+               "efficiency_index":"效率标准化(-z)","synergy_score":"协同指数","cluster_type":"聚类类型",
+               "Δenergy":"清洁能源年变动","Δgreen":"绿化率年变动","Δemission":"排放强度年变动",
+               "predicted_emission_per_gdp":"模型预测值"
+           }}),
+]
+
+# ===== 增量构建 =====
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def code_names(code):
+    """代码对象（含嵌套函数、推导式）引用的全局名"""
+    names = set(code.co_names)
+    for c in code.co_consts:
+        if inspect.iscode(c):
+            names |= code_names(c)
+    return names
+
+def stage_dependencies(func):
+    """阶段函数递归调用的本模块函数，以及引用的模块级常量（标量 / 列表 / 元组 / range；
+    IO_STATS 等运行时可变的字典不计入）"""
+    funcs, consts, pending = {}, {}, [func]
+    while pending:
+        f = pending.pop()
+        if f.__name__ in funcs:
+            continue
+        funcs[f.__name__] = f
+        for name in code_names(f.__code__):
+            obj = globals().get(name)
+            if inspect.isfunction(obj) and obj.__module__ == func.__module__:
+                pending.append(obj)
+            elif name.isupper() and isinstance(obj, (bool, int, float, str, list, tuple, range)):
+                consts[name] = obj
+    return funcs, consts
+
+def stage_fingerprint(stage):
+    """阶段参数 + 阶段代码及其依赖的辅助函数、常量的哈希；任一变化都触发重算"""
+    funcs, consts = stage_dependencies(stage.func)
+    payload = json.dumps(stage.params, ensure_ascii=False, sort_keys=True)
+    payload += "".join(inspect.getsource(funcs[n]) for n in sorted(funcs))
+    payload += "".join(f"{n}={consts[n]!r}\n" for n in sorted(consts))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def load_manifest():
+    p = META / MANIFEST_FILE
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def save_manifest(manifest):
+    (META / MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def write_stage_graph():
+    graph = [{"name": s.name, "inputs": s.inputs, "outputs": s.outputs} for s in STAGES]
+    (META / STAGES_FILE).write_text(json.dumps(graph, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def stage_outputs(stage):
+    """声明的输出 + 安装 pyarrow 时附带的 Feather 文件"""
+    if feather is None:
+        return list(stage.outputs)
+    return list(stage.outputs) + [binary_rel(rel) for rel in stage.outputs if rel.endswith(".csv")]
+
+def is_fresh(stage, entry, input_hashes):
+    """清单记录与当前输入 / 参数一致，且输出文件未被改动"""
+    if not entry or entry.get("fingerprint") != stage_fingerprint(stage) or entry.get("inputs") != input_hashes:
+        return False
+    recorded = entry.get("outputs", {})
+    for rel in stage_outputs(stage):
+        p = path_of(rel)
+        if not p.exists() or recorded.get(rel) != file_hash(p):
+            return False
+    return True
+
+def stage_deps():
+    """由声明的输入 / 输出推导依赖：{阶段名: {上游阶段名}}"""
+    producer = {rel: s.name for s in STAGES for rel in s.outputs}
+    return {s.name: {producer[rel] for rel in s.inputs if rel in producer} for s in STAGES}
+
+def cpu_seconds():
+    """本进程及已回收子进程（如聚类进程池）的 CPU 时间"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def peak_rss_mb():
+    """本进程及已回收子进程的峰值常驻内存（MB）；不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def rss_mb():
+    """当前常驻内存（MB）：Linux 读 /proc/self/statm，其他平台以迄今峰值近似；不支持的平台返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+def run_stage(name):
+    """在当前进程执行单个阶段，返回用时、CPU、峰值内存增量与读写行数。
+    峰值内存增量为阶段内峰值减去阶段开始时的常驻内存，不含已导入的 pandas / sklearn 等基础占用
+    （仍含首次读写时按需载入的解析器代码页，约 20MB，各次运行间基本恒定）；
+    峰值水位不随阶段重置，因此只有每个阶段独占新进程（--profile）时才逐阶段准确"""
+    stage = next(s for s in STAGES if s.name == name)
+    for k in IO_STATS:
+        IO_STATS[k] = 0
+    t0, c0, m0 = time.perf_counter(), cpu_seconds(), rss_mb()
+    stage.func(**stage.params)
+    peak = peak_rss_mb()
+    stats = {"wall_seconds": time.perf_counter() - t0, "cpu_seconds": cpu_seconds() - c0,
+             "peak_rss_delta_mb": None if peak is None or m0 is None else max(peak - m0, 0.0)}
+    stats.update(IO_STATS)
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in stats.items()}
+
+def stage_pool(jobs, profile):
+    """并发或剖析时使用的进程池；剖析时每个阶段独占一个新进程，峰值内存按阶段统计"""
+    if profile:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            # 由预先导入 pandas / sklearn 的 forkserver 派生子进程，免去每个阶段重复导入
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(["numpy", "pandas", "sklearn.cluster", "sklearn.linear_model"])
+        else:
+            ctx = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, max_tasks_per_child=1,
+                                   initializer=set_base, initargs=(BASE,))
+    if jobs > 1:
+        return ProcessPoolExecutor(max_workers=jobs, initializer=set_base, initargs=(BASE,))
+    return None
+
+def run_stages(force=False, jobs=1, profile=False):
+    """按依赖执行阶段：上游全部完成的阶段即可提交，jobs > 1 时在进程池中并发执行；
+    输入与参数均未变化的阶段直接跳过。返回 {阶段名: run_stage 统计}"""
+    manifest = {} if force else load_manifest()
+    write_stage_graph()
+    deps = stage_deps()
+    by_name = {s.name: s for s in STAGES}
+    pending, done, running, stats = [s.name for s in STAGES], set(), {}, {}
+
+    def record(stage, input_hashes, result):
+        print(f"✔️ {stage.name} 完成，用时 {result['wall_seconds']:.2f}s")
+        stats[stage.name] = result
+        manifest[stage.name] = {
+            "fingerprint": stage_fingerprint(stage),
+            "inputs": input_hashes,
+            "outputs": {rel: file_hash(path_of(rel)) for rel in stage_outputs(stage)},
+            "seconds": round(result["wall_seconds"], 3),
+        }
+        save_manifest(manifest)
+        done.add(stage.name)
+
+    pool = stage_pool(jobs, profile)
+    t0 = time.perf_counter()
+    try:
+        while pending or running:
+            ready = [n for n in pending if deps[n] <= done]
+            if not ready and not running:
+                raise RuntimeError(f"阶段依赖无法满足：{pending}")
+            for name in ready:
+                pending.remove(name)
+                stage = by_name[name]
+                input_hashes = {rel: file_hash(path_of(rel)) for rel in stage.inputs}
+                if is_fresh(stage, manifest.get(name), input_hashes):
+                    print(f"⏭️ {name} 未变化，跳过")
+                    done.add(name)
+                    continue
+                print(f"⚙️ {name} ...")
+                if pool is None:
+                    record(stage, input_hashes, run_stage(name))
+                else:
+                    running[pool.submit(run_stage, name)] = (stage, input_hashes)
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    stage, input_hashes = running.pop(fut)
+                    record(stage, input_hashes, fut.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    wall = time.perf_counter() - t0
+    print(f"⏱️ 共执行 {len(stats)} 个阶段，总用时 {wall:.2f}s"
+          f"（各阶段累计 {sum(r['wall_seconds'] for r in stats.values()):.2f}s）")
+    return stats, wall
+
+# ===== 性能剖析报告 =====
+# 相对基线增长超过 20% 且绝对增量超过下限时视为回归（下限用于过滤毫秒级阶段的噪声）
+PROFILE_REGRESSION = 0.2
+# 低于该绝对变化量的波动不计为回归（同一数据连续两次运行的用时抖动可达 0.1–0.2s）
+PROFILE_MIN_DELTA = {"wall_seconds": 0.25, "cpu_seconds": 0.25, "peak_rss_delta_mb": 10}
+
+def compare_profiles(current, baseline):
+    """逐阶段对比两份剖析报告：{阶段名: {指标: {"before", "after", "ratio"}, "regression": bool}}"""
+    result = {}
+    for name, cur in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        row, regression = {}, False
+        for k, floor in PROFILE_MIN_DELTA.items():
+            before, after = old.get(k), cur.get(k)
+            if before is None or after is None:
+                continue
+            ratio = after / before if before else None
+            row[k] = {"before": before, "after": after, "ratio": None if ratio is None else round(ratio, 3)}
+            if after - before > floor and (ratio is None or ratio > 1 + PROFILE_REGRESSION):
+                regression = True
+        row["regression"] = regression
+        result[name] = row
+    return result
+
+def print_profile(report):
+    print(f"{'stage':<14}{'wall(s)':>9}{'cpu(s)':>9}{'+rss(MB)':>9}{'read':>9}{'written':>9}")
+    compare = report.get("compare", {}).get("stages", {})
+    for name, r in report["stages"].items():
+        rss = "-" if r.get("peak_rss_delta_mb") is None else f"{r['peak_rss_delta_mb']:.1f}"
+        flag = "  ⚠️ 回归" if compare.get(name, {}).get("regression") else ""
+        print(f"{name:<14}{r['wall_seconds']:>9.2f}{r['cpu_seconds']:>9.2f}{rss:>9}"
+              f"{r['read_rows']:>9}{r['write_rows']:>9}{flag}")
+
+def load_profile(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def write_profile(stats, wall, jobs, baseline=None, baseline_path=None):
+    """写出 meta/pipeline_profile.json；baseline 为基线报告（需在本次覆盖前读取）"""
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "jobs": jobs,
+        "wall_seconds": round(wall, 4),
+        "stages": {s.name: stats[s.name] for s in STAGES if s.name in stats},
+    }
+    if baseline is not None:
+        report["compare"] = {"baseline": str(baseline_path), "baseline_created": baseline.get("created"),
+                             "stages": compare_profiles(report, baseline)}
+    (META / PROFILE_FILE).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print_profile(report)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="省级低碳协同数据处理流水线")
+    parser.add_argument("--force", action="store_true", help="忽略缓存清单，全部重算")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并发执行的阶段数（默认 CPU 核数；1 表示按声明顺序串行）")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"重算全部阶段并记录用时 / CPU / 峰值内存 / 读写行数，写入 meta/{PROFILE_FILE}")
+    parser.add_argument("--compare", nargs="?", const="", metavar="REPORT",
+                        help="与基线剖析报告对比（缺省为上一次的 meta/" + PROFILE_FILE + "）")
+    parser.add_argument("--verify", action="store_true", help="完成后执行数据质量检查，存在失败项时以非零状态退出")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs 必须为正整数")
+    if args.compare is not None and not args.profile:
+        parser.error("--compare 需与 --profile 一同使用")
+
+    ensure_dirs()
+    baseline = baseline_path = None
+    if args.compare is not None:
+        # 基线须在本次运行覆盖报告之前读取
+        baseline_path = Path(args.compare) if args.compare else META / PROFILE_FILE
+        if not baseline_path.exists():
+            parser.error(f"找不到基线报告：{baseline_path}")
+        baseline = load_profile(baseline_path)
+    print("🚀 数据处理开始...")
+    stats, wall = run_stages(force=args.force or args.profile, jobs=args.jobs, profile=args.profile)
+    if args.profile:
+        write_profile(stats, wall, args.jobs, baseline, baseline_path)
+    if args.verify:
+        from verify_data_quality import FAIL, generate_report
+        if generate_report(BASE)["status"] == FAIL:
+            print("❌ 数据质量检查未通过")
+            sys.exit(1)
     print("✅ 所有文件已生成，符合方案要求。")
 
 if __name__ == "__main__":
@@ -1,152 +1,370 @@
 """
 verify_data_quality.py
-版本：v2.0（适配 process_all_v4_fixed.py）
+版本：v3.0（适配 process_all.py 阶段化流水线）
 功能：
  - 检查 processed / derived / meta 各文件完整性与一致性；
- - 验证时间区间、字段、数据逻辑；
+ - 验证时间区间、取值范围、空值、(province, year) 唯一性与逐年 Z-score 不变量；
  - 检测预测值区间合理性；
+ - 每个文件只读取一次（共享缓存），检查项登记在 CHECKS 中并行执行，整表向量化计算；
+ - 结果输出为结构化 JSON（verify_report.json），同时保留文本报告；
+ - validate() 可由 process_all.py --verify 作为流水线闸门调用。
 """
 
-import os
-import pandas as pd
-import numpy as np
+import argparse
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  仅用于判断能否读取 Feather
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
 # ===== 路径配置 =====
 BASE = Path(r"D:\coding\project\lowcarbon_visualization\backend\data")
-PROC = BASE / "processed"
-DER  = BASE / "derived"
-META = BASE / "meta"
 
-# ===== 工具函数 =====
+REPORT_TEXT = "verify_report_v2.txt"
+REPORT_JSON = "verify_report.json"
+
+PASS, WARN, FAIL = "pass", "warn", "fail"
+MARKS = {PASS: "✅", WARN: "⚠️", FAIL: "❌"}
+
+# ===== 检查配置 =====
+# 文件 → 必需字段
+REQUIRED = {
+    "processed/province_emission.csv": ["province","year","emission_total","emission_per_gdp","is_imputed_emission"],
+    "processed/province_energy.csv": ["clean_ratio","fossil_ratio"],
+    "processed/province_green.csv": ["green_rate","forest_area"],
+    "processed/province_combined.csv": ["clean_ratio","green_rate","emission_per_gdp"],
+    "derived/province_standardized.csv": ["energy_index","eco_index","efficiency_index"],
+    "derived/province_synergy_index.csv": ["synergy_score"],
+    "derived/province_relation.csv": ["correlation"],
+    "derived/province_trend.csv": ["clean_ratio","green_rate","emission_per_gdp"],
+    "derived/province_delta.csv": ["Δenergy","Δgreen","Δemission"],
+    "derived/policy_timeline.csv": ["policy_name","category","level"],
+    "derived/cluster_result.csv": ["cluster_type"],
+    "derived/cluster_summary.csv": ["mean_energy","mean_eco","mean_efficiency"],
+    "derived/cluster_trajectory.csv": ["province","year","k","cluster_type"],
+    "derived/cluster_silhouette.csv": ["year","k","silhouette"],
+    "derived/model_output.csv": ["predicted_emission_per_gdp","scenario_name"],
+    "derived/rollup_cube.csv": ["grouping","n","gdp_sum"],
+    "meta/data_sources.json": [],
+    "meta/variable_dict.json": [],
+}
+
+# 文件 → 年份须覆盖的区间
+TIME_RANGES = {
+    "processed/province_emission.csv": (2003, 2022),
+    "processed/province_energy.csv": (2003, 2022),
+    "processed/province_green.csv": (2005, 2023),
+    "processed/province_combined.csv": (2005, 2022),
+}
+
+# 文件 → 唯一键
+UNIQUE_KEYS = {
+    "processed/province_emission.csv": ["province","year"],
+    "processed/province_energy.csv": ["province","year"],
+    "processed/province_green.csv": ["province","year"],
+    "processed/province_combined.csv": ["province","year"],
+    "derived/province_standardized.csv": ["province","year"],
+    "derived/province_synergy_index.csv": ["province","year"],
+    "derived/province_trend.csv": ["province","year"],
+    "derived/province_delta.csv": ["province","year"],
+    "derived/province_relation.csv": ["year","variable_x","variable_y"],
+    "derived/cluster_result.csv": ["province"],
+    "derived/cluster_trajectory.csv": ["province","year","k"],
+    "derived/cluster_silhouette.csv": ["year","k"],
+    "derived/model_output.csv": ["province","year","scenario_name"],
+}
+
+# (文件, 字段, 下限, 上限)；空值不参与
+VALUE_RANGES = [
+    ("processed/province_energy.csv", "clean_ratio", 0, 1),
+    ("processed/province_energy.csv", "fossil_ratio", 0, 1),
+    ("processed/province_green.csv", "green_rate", 0, 1),
+    ("processed/province_combined.csv", "clean_ratio", 0, 1),
+    ("processed/province_combined.csv", "green_rate", 0, 1),
+    ("processed/province_combined.csv", "emission_per_gdp", 0, np.inf),
+    ("derived/province_relation.csv", "correlation", -1, 1),
+    ("derived/cluster_silhouette.csv", "silhouette", -1, 1),
+    ("derived/model_output.csv", "clean_ratio", 0, 1),
+    ("derived/model_output.csv", "green_rate", 0, 1),
+]
+
+# 指标列空值比例超过该值时给出警告（键列出现空值直接判定失败）
+NULL_WARN_RATIO = 0.3
+# 逐年 Z-score 均值 / 标准差的容差
+ZSCORE_TOL = 1e-3
+Z_COLUMNS = ["energy_index","eco_index","efficiency_index"]
+MIN_PROVINCES = 31
+
+
+# ===== 文件缓存 =====
 def safe_read(path):
+    # 优先读取流水线同时输出的 .feather（不旧于 CSV 时），免去文本解析
+    bin_path = path.with_suffix(".feather")
+    if HAS_ARROW and bin_path.exists() and (not path.exists() or bin_path.stat().st_mtime_ns >= path.stat().st_mtime_ns):
+        try:
+            return pd.read_feather(bin_path, memory_map=True)
+        except Exception:
+            pass
     if not path.exists():
         return pd.DataFrame()
     try:
-        return pd.read_csv(path)
+        return pd.read_csv(path, encoding="utf-8-sig")
     except Exception:
         return pd.DataFrame()
 
-def check_exists():
-    print("\n📁【文件存在性检查】")
-    required = [
-        ("province_emission.csv", PROC, ["province","year","emission_total","emission_per_gdp","is_imputed_emission"]),
-        ("province_energy.csv", PROC, ["clean_ratio","fossil_ratio"]),
-        ("province_green.csv", PROC, ["green_rate","forest_area"]),
-        ("province_combined.csv", PROC, ["clean_ratio","green_rate","emission_per_gdp"]),
-        ("province_standardized.csv", DER, ["energy_index","eco_index","efficiency_index"]),
-        ("province_synergy_index.csv", DER, ["synergy_score"]),
-        ("province_relation.csv", DER, ["correlation"]),
-        ("province_trend.csv", DER, ["clean_ratio","green_rate","emission_per_gdp"]),
-        ("province_delta.csv", DER, ["Δenergy","Δgreen","Δemission"]),
-        ("policy_timeline.csv", DER, ["policy_name","category","level"]),
-        ("cluster_result.csv", DER, ["cluster_type"]),
-        ("cluster_summary.csv", DER, ["mean_energy","mean_eco","mean_efficiency"]),
-        ("model_output.csv", DER, ["predicted_emission_per_gdp","scenario_name"]),
-        ("data_sources.json", META, []),
-        ("variable_dict.json", META, []),
-    ]
-
-    missing = False
-    for name, folder, fields in required:
-        path = folder / name
-        if not path.exists():
-            print(f"{name:<30} ❌ 缺失")
-            missing = True
-        else:
-            df = safe_read(path)
-            if len(fields) > 0:
-                if all(f in df.columns for f in fields):
-                    print(f"{name:<30} ✅")
-                else:
-                    print(f"{name:<30} ⚠️ 字段不全 {set(fields)-set(df.columns)}")
-                    missing = True
-            else:
-                print(f"{name:<30} ✅")
-    return not missing
-
-
-def check_time_ranges():
-    print("\n📆【时间区间检查】")
-    checks = [
-        ("province_emission.csv", PROC, (2003,2022)),
-        ("province_energy.csv", PROC, (2003,2022)),
-        ("province_green.csv", PROC, (2005,2023)),
-        ("province_combined.csv", PROC, (2005,2022)),
-    ]
-    for name, folder, (start, end) in checks:
-        df = safe_read(folder / name)
-        if df.empty or "year" not in df.columns: continue
-        years = df["year"].dropna().astype(int)
-        if years.min() <= start and years.max() >= end:
-            print(f"{name:<30} ✅ {years.min()}–{years.max()}")
-        else:
-            print(f"{name:<30} ⚠️ 年份区间异常 {years.min()}–{years.max()}")
-
-
-def check_province_coverage():
-    print("\n🗺️【省份覆盖检查】")
-    df = safe_read(PROC / "province_combined.csv")
-    if not df.empty:
-        provinces = df["province"].nunique()
-        mark = "✅" if provinces >= 31 else "⚠️ 不足"
-        print(f"共 {provinces} 个省份（{mark}）")
-    else:
-        print("❌ 无法读取 province_combined.csv")
-
-
-def check_logic_consistency():
-    print("\n🧩【逻辑一致性检查】")
-
-    # (1) fossil+clean≈1
-    energy = safe_read(PROC / "province_energy.csv")
-    if not energy.empty:
-        energy["sum"] = energy["clean_ratio"] + energy["fossil_ratio"]
-        ok = (abs(energy["sum"]-1) < 0.01).mean()*100
-        print(f"clean+fossil≈1 正确率 {ok:.1f}% {'✅' if ok>95 else '⚠️'}")
-
-    # (2) Z-score 均值≈0
-    std = safe_read(DER / "province_standardized.csv")
-    if not std.empty:
-        zs = {c: round(std[c].mean(),3) for c in ["energy_index","eco_index","efficiency_index"]}
-        print(f"Z-score 均值 {zs} {'✅' if all(abs(v)<0.05 for v in zs.values()) else '⚠️'}")
-
-    # (3) 协同相关方向
-    rel = safe_read(DER / "province_relation.csv")
-    if not rel.empty:
-        sub = rel.query("year==2022")
-        corr = sub.pivot(index="variable_x",columns="variable_y",values="correlation")
-        if all(x in corr.columns for x in ["clean_ratio","green_rate","emission_per_gdp"]):
-            c1, c2, c3 = corr.loc["clean_ratio","emission_per_gdp"], corr.loc["green_rate","emission_per_gdp"], corr.loc["clean_ratio","green_rate"]
-            mark = "✅ 合理" if (c1<0 and c2<0 and c3>0) else "⚠️ 异常"
-            print(f"协同相关: clean={c3:.2f}, green={c2:.2f}, emission={c1:.2f} → {mark}")
-
-    # (4) 预测值合理性
-    pred = safe_read(DER / "model_output.csv")
-    if not pred.empty:
-        minv, maxv = pred["predicted_emission_per_gdp"].min(), pred["predicted_emission_per_gdp"].max()
-        if 0.02 <= minv and maxv <= 0.5:
-            print(f"预测值范围 {minv:.3f}–{maxv:.3f} ✅ 合理")
-        else:
-            print(f"⚠️ 预测值异常 {minv:.3f}–{maxv:.3f}")
-
-
-def generate_report():
-    import sys
-    from io import StringIO
-    backup_stdout = sys.stdout
-    sys.stdout = report = StringIO()
-
-    check_exists()
-    check_time_ranges()
-    check_province_coverage()
-    check_logic_consistency()
-
-    sys.stdout = backup_stdout
-    text = report.getvalue()
-    (BASE / "verify_report_v2.txt").write_text(text, encoding="utf-8")
+
+class ArtifactCache:
+    """每个文件只读取一次，供所有检查共享（检查方不得原地修改）"""
+
+    def __init__(self, base):
+        self.base = Path(base)
+        self._frames = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def exists(self, rel):
+        return (self.base / rel).exists()
+
+    def frame(self, rel):
+        df = self._frames.get(rel)
+        if df is not None:
+            return df
+        with self._lock:
+            lock = self._locks.setdefault(rel, threading.Lock())
+        with lock:
+            if rel not in self._frames:
+                self._frames[rel] = safe_read(self.base / rel)
+            return self._frames[rel]
+
+
+# ===== 检查登记 =====
+# (分组, 函数)；函数接收 ArtifactCache，返回结果列表
+CHECKS = []
+
+def check(group):
+    def register(fn):
+        CHECKS.append((group, fn))
+        return fn
+    return register
+
+def result(name, status, message, **details):
+    return {"name": name, "status": status, "message": message, "details": details}
+
+def worst(statuses):
+    statuses = list(statuses)
+    return FAIL if FAIL in statuses else WARN if WARN in statuses else PASS
+
+def available(cache, rel, cols=()):
+    """文件可读且包含 cols 时返回 DataFrame，否则返回 None（缺失由 exists 检查报告）"""
+    df = cache.frame(rel)
+    if df.empty or any(c not in df.columns for c in cols):
+        return None
+    return df
+
+
+@check("exists")
+def check_exists(cache):
+    out = []
+    for rel, fields in REQUIRED.items():
+        if not cache.exists(rel):
+            out.append(result(rel, FAIL, "缺失"))
+            continue
+        if not fields:
+            out.append(result(rel, PASS, "存在"))
+            continue
+        missing = [f for f in fields if f not in cache.frame(rel).columns]
+        out.append(result(rel, FAIL, f"字段不全 {missing}", missing=missing) if missing
+                   else result(rel, PASS, "字段完整"))
+    return out
+
+
+@check("time_range")
+def check_time_ranges(cache):
+    out = []
+    for rel, (start, end) in TIME_RANGES.items():
+        df = available(cache, rel, ["year"])
+        if df is None:
+            continue
+        years = df["year"].dropna()
+        lo, hi = int(years.min()), int(years.max())
+        ok = lo <= start and hi >= end
+        out.append(result(rel, PASS if ok else WARN, f"{lo}–{hi}" if ok else f"年份区间异常 {lo}–{hi}",
+                          min=lo, max=hi, expected=[start, end]))
+    return out
+
+
+@check("coverage")
+def check_province_coverage(cache):
+    df = available(cache, "processed/province_combined.csv", ["province"])
+    if df is None:
+        return [result("province_coverage", FAIL, "无法读取 province_combined.csv")]
+    n = int(df["province"].nunique())
+    return [result("province_coverage", PASS if n >= MIN_PROVINCES else WARN,
+                   f"共 {n} 个省份" + ("" if n >= MIN_PROVINCES else "（不足）"), provinces=n)]
+
+
+@check("nulls")
+def check_nulls(cache):
+    out = []
+    for rel, keys in UNIQUE_KEYS.items():
+        df = available(cache, rel, keys)
+        if df is None:
+            continue
+        ratios = df.isna().mean()
+        key_nulls = {k: int(df[k].isna().sum()) for k in keys if ratios[k] > 0}
+        high = {c: round(float(r), 3) for c, r in ratios.items() if c not in keys and r > NULL_WARN_RATIO}
+        status = FAIL if key_nulls else WARN if high else PASS
+        msg = (f"键列存在空值 {key_nulls}" if key_nulls else
+               f"空值比例偏高 {high}" if high else "键列无空值")
+        out.append(result(rel, status, msg, key_nulls=key_nulls,
+                          null_ratio={c: round(float(r), 3) for c, r in ratios.items() if r > 0}))
+    return out
+
+
+@check("unique")
+def check_unique_keys(cache):
+    out = []
+    for rel, keys in UNIQUE_KEYS.items():
+        df = available(cache, rel, keys)
+        if df is None:
+            continue
+        dup = int(df.duplicated(keys).sum())
+        out.append(result(rel, FAIL if dup else PASS, f"{tuple(keys)} 重复 {dup} 行" if dup else f"{tuple(keys)} 唯一",
+                          keys=keys, duplicates=dup))
+    return out
+
+
+@check("range")
+def check_value_ranges(cache):
+    out = []
+    for rel, col, lo, hi in VALUE_RANGES:
+        df = available(cache, rel, [col])
+        if df is None:
+            continue
+        v = df[col].to_numpy(dtype=float)
+        bad = int(((v < lo) | (v > hi)).sum())
+        out.append(result(f"{rel}:{col}", FAIL if bad else PASS,
+                          f"{bad} 个值超出 [{lo}, {hi}]" if bad else f"[{lo}, {hi}] 内",
+                          out_of_range=bad, min=float(np.nanmin(v)) if len(v) else None,
+                          max=float(np.nanmax(v)) if len(v) else None))
+    return out
+
+
+@check("zscore")
+def check_zscore_by_year(cache):
+    rel = "derived/province_standardized.csv"
+    df = available(cache, rel, ["year"] + Z_COLUMNS)
+    if df is None:
+        return []
+    # 每年、每列的非空个数 / 均值 / 总体标准差，一次 groupby 完成
+    g = df.groupby("year")[Z_COLUMNS]
+    count, mean, sd = g.count(), g.mean(), g.std(ddof=0)
+    valid = count >= 2
+    mean_err = mean.abs().where(valid)
+    sd_err = (sd - 1).abs().where(valid & (sd > 0))
+    out = []
+    for col in Z_COLUMNS:
+        bad_years = sorted(int(y) for y in mean_err.index[(mean_err[col] > ZSCORE_TOL) | (sd_err[col] > ZSCORE_TOL)])
+        out.append(result(f"{rel}:{col}", FAIL if bad_years else PASS,
+                          f"逐年均值≠0 或标准差≠1 的年份 {bad_years}" if bad_years else "逐年均值≈0、标准差≈1",
+                          max_mean_error=float(mean_err[col].max()), max_std_error=float(sd_err[col].max()),
+                          bad_years=bad_years))
+    return out
+
+
+@check("logic")
+def check_energy_share(cache):
+    energy = available(cache, "processed/province_energy.csv", ["clean_ratio","fossil_ratio"])
+    if energy is None:
+        return []
+    ok = float((np.abs(energy["clean_ratio"] + energy["fossil_ratio"] - 1) < 0.01).mean() * 100)
+    return [result("clean+fossil≈1", PASS if ok > 95 else WARN, f"正确率 {ok:.1f}%", percent=round(ok, 1))]
+
+
+@check("logic")
+def check_relation_direction(cache):
+    rel = available(cache, "derived/province_relation.csv", ["year","variable_x","variable_y","correlation"])
+    if rel is None:
+        return []
+    year = int(rel["year"].max())
+    corr = rel[rel["year"] == year].pivot(index="variable_x", columns="variable_y", values="correlation")
+    if not all(x in corr.columns for x in ["clean_ratio","green_rate","emission_per_gdp"]):
+        return []
+    c1, c2, c3 = (float(corr.loc["clean_ratio","emission_per_gdp"]), float(corr.loc["green_rate","emission_per_gdp"]),
+                  float(corr.loc["clean_ratio","green_rate"]))
+    ok = c1 < 0 and c2 < 0 and c3 > 0
+    return [result("relation_direction", PASS if ok else WARN,
+                   f"{year} 协同相关: clean={c3:.2f}, green={c2:.2f}, emission={c1:.2f} → {'合理' if ok else '异常'}",
+                   year=year, clean_green=c3, green_emission=c2, clean_emission=c1)]
+
+
+@check("logic")
+def check_prediction_range(cache):
+    pred = available(cache, "derived/model_output.csv", ["predicted_emission_per_gdp"])
+    if pred is None:
+        return []
+    minv, maxv = float(pred["predicted_emission_per_gdp"].min()), float(pred["predicted_emission_per_gdp"].max())
+    ok = 0.02 <= minv and maxv <= 0.5
+    return [result("prediction_range", PASS if ok else WARN,
+                   f"预测值范围 {minv:.3f}–{maxv:.3f}" + (" 合理" if ok else " 异常"), min=minv, max=maxv)]
+
+
+# ===== 执行与报告 =====
+def validate(base=None, groups=None, jobs=None):
+    """执行已登记的检查（可按分组筛选），返回结构化结果；status 为所有检查中最差的状态"""
+    cache = ArtifactCache(BASE if base is None else base)
+    selected = [(g, fn) for g, fn in CHECKS if groups is None or g in groups]
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        outputs = list(ex.map(lambda item: item[1](cache), selected))
+    checks = [dict(r, group=g) for (g, _), rs in zip(selected, outputs) for r in rs]
+    summary = {s: sum(c["status"] == s for c in checks) for s in (PASS, WARN, FAIL)}
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "base": str(cache.base),
+        "status": worst(c["status"] for c in checks),
+        "summary": summary,
+        "checks": checks,
+    }
+
+def render_text(report):
+    lines, group = [], None
+    for c in report["checks"]:
+        if c["group"] != group:
+            group = c["group"]
+            lines.append(f"\n【{group}】")
+        lines.append(f"{c['name']:<50} {MARKS[c['status']]} {c['message']}")
+    s = report["summary"]
+    lines.append(f"\n通过 {s[PASS]} / 警告 {s[WARN]} / 失败 {s[FAIL]}")
+    return "\n".join(lines) + "\n"
+
+def generate_report(base=None, groups=None, jobs=None):
+    report = validate(base, groups, jobs)
+    out_dir = BASE if base is None else Path(base)
+    text = render_text(report)
+    (out_dir / REPORT_TEXT).write_text(text, encoding="utf-8")
+    (out_dir / REPORT_JSON).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
     print(text)
-    print("✅ 验证报告已生成：verify_report_v2.txt")
+    print(f"✅ 验证报告已生成：{REPORT_TEXT}、{REPORT_JSON}")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据质量检查")
+    parser.add_argument("--base", help="数据根目录（默认为 BASE）")
+    parser.add_argument("--groups", nargs="+", choices=sorted({g for g, _ in CHECKS}), help="只执行指定分组")
+    parser.add_argument("--jobs", type=int, help="并行线程数（默认由线程池决定）")
+    args = parser.parse_args(argv)
+    report = generate_report(args.base, args.groups, args.jobs)
+    return 1 if report["status"] == FAIL else 0
 
 if __name__ == "__main__":
-    generate_report()
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+datastore.py
+进程级数据集注册表：
+- 每张 processed / derived 表只解析一次，常驻内存；
+- 仅当文件 mtime / size 变化时才重新加载；
+- 记录命中 / 未命中 / 重载计数，供接口与监控查看；
+- 加载时预建 (province, year) / province / year 行号索引，过滤查询无需整列扫描；
+- 优先内存映射读取同名 .feather（需安装 pyarrow），缺失时回退到 CSV。
+"""
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # 可选依赖：未安装时只读 CSV
+    feather = None
+
+
+def read_csv(path):
+    """读取 CSV，并处理 UTF-8 BOM 与列名清理"""
+    # 兼容带 BOM 的 CSV
+    try:
+        df = pd.read_csv(path, encoding="utf-8-sig")
+    except Exception:
+        df = pd.read_csv(path)
+    # 列名清理：去掉不可见字符与首尾空格
+    df.columns = [str(c).replace("\ufeff", "").strip() for c in df.columns]
+    return df
+
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def build_index(df):
+    """预建行号索引：{(province, year): rows}、{province: rows}、{year: rows}"""
+    index = {}
+    has_p, has_y = "province" in df.columns, "year" in df.columns
+    if has_p:
+        index["province"] = df.groupby("province", sort=False, observed=True).indices
+    if has_y:
+        index["year"] = df.groupby("year", sort=False, observed=True).indices
+    if has_p and has_y:
+        index["province_year"] = df.groupby(["province", "year"], sort=False, observed=True).indices
+    return index
+
+
+def read_feather(path):
+    """内存映射读取 Feather：无 null 的数值列（含 float64 指标列）直接引用文件页，不复制"""
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def locate(csv_path):
+    """选择实际读取的文件：同名 .feather 存在且不旧于 CSV 时优先使用。
+    返回 (路径, 签名)；两者都不存在时抛出 OSError"""
+    if feather is not None:
+        bin_path = csv_path.with_suffix(".feather")
+        try:
+            bst = bin_path.stat()
+        except OSError:
+            bst = None
+        if bst is not None:
+            try:
+                newer_csv = csv_path.stat().st_mtime_ns > bst.st_mtime_ns
+            except OSError:
+                newer_csv = False
+            if not newer_csv:
+                return bin_path, (".feather", bst.st_mtime_ns, bst.st_size)
+    st = csv_path.stat()
+    return csv_path, (".csv", st.st_mtime_ns, st.st_size)
+
+
+class Versioned:
+    """可参与响应缓存的对象（app.cached_response / frame_response 的 datasets 参数）：
+    - key：来源文件 (folder, name)，DatasetStore 重载该文件时清除依赖它的缓存条目；
+    - version：进入缓存键，内容变化时必须随之改变；
+    - signature：来源文件签名，ArtifactStore 据此判断是否需要重新加载。
+    Dataset 与由表 / 工件派生的对象（汇总立方体、标准化数组、相关矩阵、情景模型）均继承本类；
+    由 Dataset 派生的对象以 inherit(ds) 沿用其三项"""
+
+    __slots__ = ("key", "signature", "version")
+
+    def __init__(self, key, signature, version):
+        self.key = key
+        self.signature = signature
+        self.version = version
+
+    def inherit(self, ds):
+        """沿用来源 Dataset 的 key / signature / version"""
+        Versioned.__init__(self, ds.key, ds.signature, ds.version)
+
+
+class Dataset(Versioned):
+    """已加载的一张表：DataFrame + 文件签名 + 版本号（每次重载递增）+ 行号索引"""
+
+    __slots__ = ("df", "index")
+
+    def __init__(self, key, df, signature, version):
+        super().__init__(key, signature, version)
+        self.df = df
+        self.index = build_index(df)
+
+    def rows(self, province=None, year=None, provinces=None, year_from=None, year_to=None):
+        """按省份 / 年份条件取行号（升序）；无过滤条件时返回 None（表示全表）。缺少对应列的条件被忽略"""
+        parts = []
+        if province and year is not None and "province_year" in self.index:
+            parts.append(self.index["province_year"].get((province, year), _EMPTY))
+        elif province and "province" in self.index:
+            parts.append(self.index["province"].get(province, _EMPTY))
+        elif year is not None and "year" in self.index:
+            parts.append(self.index["year"].get(year, _EMPTY))
+        if provinces is not None and "province" in self.index:
+            by_p = self.index["province"]
+            parts.append(_union([by_p[p] for p in provinces if p in by_p]))
+        if (year_from is not None or year_to is not None) and "year" in self.index:
+            lo = -np.inf if year_from is None else year_from
+            hi = np.inf if year_to is None else year_to
+            parts.append(_union([r for y, r in self.index["year"].items() if lo <= y <= hi]))
+        if not parts:
+            return None
+        rows = parts[0]
+        for other in parts[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def select(self, province=None, year=None, cols=None, provinces=None, year_from=None, year_to=None):
+        """按索引切片，等价于 df[(df.province == p) & (df.year == y) & ...][cols]"""
+        df = self.df if cols is None else self.df[cols]
+        rows = self.rows(province, year, provinces, year_from, year_to)
+        return df if rows is None else df.iloc[rows]
+
+
+def _union(parts):
+    """合并多组升序行号，结果保持原表行序"""
+    if not parts:
+        return _EMPTY
+    return np.sort(np.concatenate(parts))
+
+
+class DatasetStore:
+    """按 (folder, name) 缓存数据表，文件变化时自动失效"""
+
+    def __init__(self, base):
+        self.base = Path(base)
+        self._tables = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def on_reload(self, callback):
+        """注册回调：表被重载或文件被删除时以 (folder, name) 调用"""
+        self._listeners.append(callback)
+
+    def _notify(self, key):
+        for cb in self._listeners:
+            cb(key)
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get(self, folder, name):
+        """返回 Dataset；文件不存在时返回 None"""
+        key = (folder, name)
+        try:
+            path, sig = locate(self.base / folder / name)
+        except OSError:
+            with self._lock:
+                dropped = self._tables.pop(key, None)
+            if dropped is not None:
+                self._notify(key)
+            return None
+
+        ds = self._tables.get(key)
+        if ds is not None and ds.signature == sig:
+            with self._lock:
+                self.hits += 1
+            return ds
+
+        # 同一张表只允许一个线程解析，其余线程等待后直接复用结果
+        with self._key_lock(key):
+            ds = self._tables.get(key)
+            if ds is not None and ds.signature == sig:
+                with self._lock:
+                    self.hits += 1
+                return ds
+            df = read_feather(path) if path.suffix == ".feather" else read_csv(path)
+            with self._lock:
+                if ds is None:
+                    self.misses += 1
+                else:
+                    self.reloads += 1
+                self._version += 1
+                reloaded = key in self._tables
+                ds = Dataset(key, df, sig, self._version)
+                self._tables[key] = ds
+            if reloaded:
+                self._notify(key)
+            return ds
+
+    def warm(self, keys):
+        """预加载 keys 中的全部表（preload / fork 前调用，各 worker 以写时复制共享），返回缺失的表"""
+        return [key for key in keys if self.get(*key) is None]
+
+    def is_loaded(self, folder, name):
+        return (folder, name) in self._tables
+
+    def load(self, folder, name):
+        """仅返回 DataFrame（调用方不得原地修改）"""
+        ds = self.get(folder, name)
+        return None if ds is None else ds.df
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "tables": [
+                    {"folder": k[0], "name": k[1], "source": ds.signature[0], "rows": len(ds.df),
+                     "version": ds.version}
+                    for k, ds in sorted(self._tables.items())
+                ],
+            }
+
+
+class ArtifactStore:
+    """单文件工件（模型 JSON、npz 数组等）按 mtime / size 缓存；
+    loader(path, signature) 返回 Versioned 对象"""
+
+    def __init__(self, path, loader):
+        self.path = Path(path)
+        self.loader = loader
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """返回已加载的对象；文件不存在时返回 None"""
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        sig = (st.st_mtime_ns, st.st_size)
+        obj = self._obj
+        if obj is not None and obj.signature == sig:
+            return obj
+        with self._lock:
+            if self._obj is None or self._obj.signature != sig:
+                self._obj = self.loader(self.path, sig)
+            return self._obj
+
+    def is_loaded(self):
+        return self._obj is not None
+
+
+class DerivedCache:
+    """由某张表派生的对象（数组、索引等），按 Dataset 版本缓存：表重载后首次访问时以 build(ds) 重建"""
+
+    def __init__(self, build):
+        self.build = build
+        self._obj = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, ds):
+        obj = self._obj
+        if obj is not None and self._version == ds.version:
+            return obj
+        with self._lock:
+            if self._obj is None or self._version != ds.version:
+                self._obj = self.build(ds)
+                self._version = ds.version
+            return self._obj
+
+    def is_loaded(self):
+        return self._obj is not None
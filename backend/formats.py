@@ -0,0 +1,76 @@
+"""
+formats.py
+响应格式与压缩：
+- records：默认的 orient=records 行式 JSON；
+- columns：列式 JSON {"列名": [值, ...]}，列名只出现一次；
+- arrow：Apache Arrow IPC 流（需安装 pyarrow）；
+- 压缩：gzip（标准库）与 brotli（需安装 brotli）。
+"""
+
+import gzip
+import json
+
+try:
+    import pyarrow as pa
+except ImportError:  # 可选依赖
+    pa = None
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+JSON_MIME = "application/json"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+FORMATS = ("records", "columns", "arrow")
+
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_BYTES = 1024
+
+
+def to_records(df):
+    return df.to_json(orient="records", force_ascii=False)
+
+
+def to_columns(df):
+    parts = [f"{json.dumps(str(c), ensure_ascii=False)}:{df[c].to_json(orient='values', force_ascii=False)}"
+             for c in df.columns]
+    return "{" + ",".join(parts) + "}"
+
+
+def to_ndjson(df):
+    """每行一条 JSON 记录，以换行结尾（用于流式导出）"""
+    if df.empty:
+        return ""
+    text = df.to_json(orient="records", lines=True, force_ascii=False)
+    return text if text.endswith("\n") else text + "\n"
+
+
+def to_csv_text(df, header):
+    return df.to_csv(index=False, header=header)
+
+
+def to_json_text(df, fmt):
+    return to_columns(df) if fmt == "columns" else to_records(df)
+
+
+def to_arrow(df):
+    """序列化为 Arrow IPC 流字节"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def available_encodings():
+    """服务端支持的 Content-Encoding，按优先级排列"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9)
+    raise ValueError(f"unsupported encoding: {encoding}")
@@ -0,0 +1,22 @@
+"""
+gunicorn.conf.py
+生产模式配置：多进程（prefork）+ 每进程多线程，数据表在 fork 之前加载。
+可用环境变量覆盖：LOWCARBON_BIND / LOWCARBON_WORKERS / LOWCARBON_THREADS；
+LOWCARBON_SLOW_MS 设置慢请求日志阈值（毫秒），LOWCARBON_CACHE_MB 设置每个 worker 的响应缓存字节上限。
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("LOWCARBON_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("LOWCARBON_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("LOWCARBON_THREADS", 4))
+worker_class = "gthread"
+
+# 在 master 中导入 wsgi（完成数据预热）后再 fork
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
@@ -0,0 +1,142 @@
+"""
+metrics.py
+请求级指标（进程内，无第三方依赖）：
+- 每条路由的总延迟、各阶段（load / filter / serialize / compress）耗时与响应字节数直方图；
+- 按 (路由, 方法, 状态码) 计数，包括 404 "file not found"；
+- 以 Prometheus 文本格式输出，供 /metrics 抓取；
+- 可选慢请求日志：总延迟超过阈值时记录各阶段耗时。
+多进程部署时每个 worker 各自计数，抓取结果只反映响应该次请求的 worker。
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# 延迟直方图上界（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 响应字节数直方图上界
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PHASES = ("load", "filter", "serialize", "compress")
+
+
+class Histogram:
+    """累积直方图：counts[i] 为落入 (buckets[i-1], buckets[i]] 的观测数，最后一格为 +Inf"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(pairs):
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def _fmt(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class RequestMetrics:
+    """直方图与计数器按 (指标名, 标签) 存放；阶段耗时在请求上下文（flask.g）中累加"""
+
+    def __init__(self, prefix="lowcarbon"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._families = {}   # 指标名 → (类型, 说明)
+        self._hist = {}       # (指标名, 标签) → Histogram
+        self._counters = {}   # (指标名, 标签) → 计数
+        self._declare("request_seconds", "histogram", "请求总延迟（秒）")
+        self._declare("phase_seconds", "histogram", "请求各阶段耗时（秒）：load / filter / serialize / compress")
+        self._declare("response_bytes", "histogram", "响应体字节数（流式响应不计）")
+        self._declare("requests_total", "counter", "按路由、方法与状态码统计的请求数")
+
+    def _declare(self, name, kind, help_text):
+        self._families[f"{self.prefix}_{name}"] = (kind, help_text)
+
+    def _observe(self, name, labels, value, buckets):
+        key = (f"{self.prefix}_{name}", labels)
+        with self._lock:
+            hist = self._hist.get(key)
+            if hist is None:
+                hist = self._hist[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def _inc(self, name, labels):
+        key = (f"{self.prefix}_{name}", labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    # —— 请求上下文 ——
+    def start(self):
+        g.metrics_t0 = time.perf_counter()
+        g.metrics_phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """累计当前请求在某阶段的耗时；请求上下文之外（如预热）不记录"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if has_request_context() and "metrics_phases" in g:
+                phases = g.metrics_phases
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def finish(self, route, method, status, nbytes):
+        """记录一次请求，返回 (总耗时, {阶段: 耗时})；未经过 start() 时返回 None"""
+        t0 = g.pop("metrics_t0", None)
+        if t0 is None:
+            return None
+        elapsed = time.perf_counter() - t0
+        phases = g.pop("metrics_phases", {})
+        route_label = (("route", route),)
+        self._observe("request_seconds", route_label, elapsed, LATENCY_BUCKETS)
+        for name, seconds in phases.items():
+            self._observe("phase_seconds", route_label + (("phase", name),), seconds, LATENCY_BUCKETS)
+        if nbytes is not None:
+            self._observe("response_bytes", route_label, nbytes, BYTES_BUCKETS)
+        self._inc("requests_total", route_label + (("method", method), ("status", status)))
+        return elapsed, phases
+
+    # —— 输出 ——
+    def render(self, extra=()):
+        """Prometheus 文本格式；extra 为附加的 (指标名, 类型, 说明, 值) 序列"""
+        with self._lock:
+            hists = {k: (list(h.counts), h.sum, h.count, h.buckets) for k, h in self._hist.items()}
+            counters = dict(self._counters)
+        lines = []
+        for family, (kind, help_text) in self._families.items():
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            if kind == "histogram":
+                for (name, labels), (counts, total, count, buckets) in sorted(hists.items()):
+                    if name != family:
+                        continue
+                    cumulative = 0
+                    for le, n in zip(list(buckets) + ["+Inf"], counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_fmt(total)}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                for (name, labels), n in sorted(counters.items()):
+                    if name == family:
+                        lines.append(f"{name}{_labels(labels)} {n}")
+        for name, kind, help_text, value in extra:
+            family = f"{self.prefix}_{name}"
+            lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}", f"{family} {_fmt(value)}"]
+        return "\n".join(lines) + "\n"
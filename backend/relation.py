@@ -0,0 +1,65 @@
+"""
+relation.py
+滑动窗口相关矩阵（由 process_all.py 的 relation 阶段写出 derived/relation_cube.npz）：
+- pooled[k, y, i, j]：窗口 windows[k]、截至年份 y，全部省份混合样本的相关；
+- by_province[k, y, p, i, j]：同一窗口内各省份自身时间序列的相关。
+接口只做切片与展开，不重新计算。
+"""
+
+import numpy as np
+import pandas as pd
+
+from datastore import Versioned
+
+
+class RelationCube(Versioned):
+    """已加载的相关矩阵数组；版本取文件签名"""
+
+    def __init__(self, arrays, signature):
+        super().__init__(("derived", "relation_cube.npz"), signature, f"{signature[0]}-{signature[1]}")
+        self.years = arrays["years"]
+        self.variables = [str(v) for v in arrays["variables"]]
+        self.windows = [int(w) for w in arrays["windows"]]
+        # 计算相关所需的最少样本数；单省窗口内样本数即窗口年数，小于它的窗口全部为空
+        self.min_obs = int(arrays["min_obs"]) if "min_obs" in arrays else 1
+        self.provinces = [str(p) for p in arrays["provinces"]]
+        self.pooled = arrays["pooled"]
+        self.by_province = arrays["by_province"]
+
+    @classmethod
+    def load(cls, path, signature):
+        """供 ArtifactStore 调用的加载函数"""
+        with np.load(path, allow_pickle=False) as z:
+            return cls({k: z[k] for k in z.files}, signature)
+
+    def province_windows(self):
+        """各省时间序列相关可用（样本数不少于 min_obs）的窗口"""
+        return [w for w in self.windows if w >= self.min_obs]
+
+    def select(self, window, years=None, variables=None, provinces=None):
+        """按窗口 / 年份 / 变量 /（可选）省份切片，展开为长表；
+        provinces 为 None 时返回混合截面相关，否则返回各省时间序列相关"""
+        k = self.windows.index(window)
+        yi = np.arange(len(self.years)) if years is None else np.flatnonzero(np.isin(self.years, years))
+        vi = np.arange(len(self.variables)) if variables is None else \
+            np.array([self.variables.index(v) for v in variables if v in self.variables], dtype=int)
+        names = np.asarray(self.variables, dtype=object)[vi]
+        V = len(vi)
+        if provinces is None:
+            block = self.pooled[k][np.ix_(yi, vi, vi)]
+            lead = {"year": np.repeat(self.years[yi], V*V)}
+        else:
+            pi = np.array([self.provinces.index(p) for p in provinces if p in self.provinces], dtype=int)
+            block = self.by_province[k][np.ix_(yi, pi, vi, vi)]
+            lead = {
+                "year": np.repeat(self.years[yi], len(pi)*V*V),
+                "province": np.tile(np.repeat(np.asarray(self.provinces, dtype=object)[pi], V*V), len(yi)),
+            }
+        n = block.size // (V*V) if V else 0
+        return pd.DataFrame({
+            **lead,
+            "window": window,
+            "variable_x": np.tile(np.repeat(names, V), n),
+            "variable_y": np.tile(names, V*n),
+            "correlation": block.ravel(),
+        })
@@ -0,0 +1,111 @@
+"""
+respcache.py
+序列化结果缓存：
+- 按 (endpoint, 查询参数, 数据版本) 缓存已序列化的响应字节，条目数与总字节数（原文 + 各编码压缩字节）
+  双重有界，超出任一上限时按 LRU 淘汰；
+- 每个条目附带强 ETag（内容哈希），配合 If-None-Match 返回 304；
+- 压缩后的字节与原文一同缓存，同一编码只压缩一次；
+- 底层数据表重载时，依赖该表的条目全部失效。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from formats import compress
+
+
+class CachedPayload:
+    """一次序列化的结果：响应体字节 + 强 ETag + 依赖的数据表 + 附加响应头 + 各编码的压缩字节"""
+
+    __slots__ = ("key", "body", "etag", "mimetype", "deps", "headers", "encoded", "nbytes")
+
+    def __init__(self, key, body, mimetype, deps, headers=None):
+        self.key = key
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.mimetype = mimetype
+        self.deps = frozenset(deps)
+        self.headers = dict(headers or {})
+        self.encoded = {}
+        self.nbytes = len(body)
+
+
+class ResponseCache:
+    """有界 LRU：条目数不超过 maxsize，原文与压缩字节合计不超过 maxbytes；
+    key 由调用方构造，deps 为依赖的数据表 key 集合"""
+
+    def __init__(self, maxsize=256, maxbytes=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.maxsize or self.nbytes > self.maxbytes):
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+
+    def put(self, key, body, mimetype, deps, headers=None):
+        """登记新条目并返回；单个条目超过 maxbytes 时只返回、不缓存"""
+        entry = CachedPayload(key, body, mimetype, deps, headers)
+        if entry.nbytes > self.maxbytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def encode(self, entry, encoding):
+        """返回 entry 指定编码的压缩字节（首次调用时压缩）；压缩字节计入总字节数，
+        条目已被淘汰或压缩后超出预算时仍返回结果"""
+        data = entry.encoded.get(encoding)
+        if data is not None:
+            return data
+        data = compress(entry.body, encoding)
+        with self._lock:
+            if encoding in entry.encoded:  # 其他线程已完成同一压缩
+                return entry.encoded[encoding]
+            entry.encoded[encoding] = data
+            entry.nbytes += len(data)
+            if self._entries.get(entry.key) is entry:
+                self.nbytes += len(data)
+                self._evict()
+        return data
+
+    def invalidate(self, dep):
+        """删除所有依赖 dep（数据表 key）的条目"""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if dep in e.deps]
+            for k in stale:
+                self.nbytes -= self._entries.pop(k).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries), "maxsize": self.maxsize,
+                    "bytes": self.nbytes, "maxbytes": self.maxbytes}
@@ -0,0 +1,52 @@
+"""
+rollup.py
+汇总立方体（由 process_all.py 的 rollup 阶段写出 derived/rollup_cube.csv）：
+- 每行为一个维度组合（grouping 列，如 "region,year"）下的一个分组，已含 n、gdp_sum
+  以及各指标的 _sum / _mean / _wmean（GDP 加权均值）；
+- cluster_type 取基准年聚类（cluster_result.csv）的类别，对各年份固定，因此省份唯一决定地区与聚类类型；
+- 加载时按 grouping 拆成子表并建行号索引，查询只在对应子表上取行，不扫描省份明细。
+"""
+
+import numpy as np
+
+from datastore import Dataset, Versioned
+
+DIMENSIONS = ("region", "province", "year", "cluster_type")
+
+
+def grouping_key(by):
+    """规范化 by=...：按 DIMENSIONS 顺序排列；省份唯一决定地区与聚类类型，含省份时二者省略"""
+    dims = [d for d in DIMENSIONS if d in by]
+    if "province" in dims:
+        dims = [d for d in dims if d not in ("region", "cluster_type")]
+    return ",".join(dims) or "all"
+
+
+class RollupCube(Versioned):
+    """某一版本 rollup_cube.csv 按 grouping 拆分的子表"""
+
+    def __init__(self, ds):
+        self.inherit(ds)
+        df = ds.df
+        # 各 grouping 返回的列：该组合的维度（含省份时附带地区与聚类类型）+ 全部度量，不含已汇总掉的维度
+        measures = [c for c in df.columns if c != "grouping" and c not in DIMENSIONS]
+        self.groupings = {}
+        for g, rows in df.groupby("grouping", sort=False).indices.items():
+            dims = g.split(",")
+            if "province" in dims:
+                dims = dims + ["region", "cluster_type"]
+            cols = [d for d in DIMENSIONS if d in dims]
+            sub = df.iloc[rows][cols + measures].reset_index(drop=True)
+            # 整表中 year / cluster_type 因汇总行含空值被读成浮点，子表内无空值，还原为整数
+            sub = sub.astype({c: "int64" for c in ("year", "cluster_type") if c in cols})
+            self.groupings[g] = Dataset(ds.key, sub, ds.signature, ds.version)
+
+    def select(self, grouping, regions=None, cluster_types=None, **filters):
+        """在 grouping 子表上按 地区 / 聚类类型 / 省份 / 年份 过滤；
+        调用方须保证带条件的维度都在 grouping 中（见 grouping_key），否则子表缺列会抛 KeyError"""
+        df = self.groupings[grouping].select(**filters)
+        if regions is not None:
+            df = df[df["region"].isin(regions).to_numpy()]
+        if cluster_types is not None:
+            df = df[np.isin(df["cluster_type"].to_numpy(), cluster_types)]
+        return df
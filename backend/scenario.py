@@ -0,0 +1,59 @@
+"""
+scenario.py
+what-if 情景推演：
+- 加载 process_all.py 写出的 meta/forecast_model.json（StandardScaler + LinearRegression 参数），
+  由 datastore.ArtifactStore 在文件变化时自动重载；
+- 对 (省份 × 年份) 批量施加 clean_ratio / green_rate 增量，一次矩阵运算完成预测；
+- 最近的情景请求结果保存在 LRU 中。
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datastore import Versioned
+
+
+class ScenarioModel(Versioned):
+    """已加载的模型工件；版本取工件内的模型内容哈希"""
+
+    def __init__(self, artifact, signature):
+        super().__init__(("meta", "forecast_model.json"), signature, artifact["version"])
+        self.artifact = artifact
+        self.base_year = int(artifact["base_year"])
+        self.start_year = int(artifact["start_year"])
+        self.end_year = int(artifact["end_year"])
+        base = artifact["baseline"]
+        self.provinces = list(base["province"])
+        self._row = {p: i for i, p in enumerate(self.provinces)}
+        self._base = np.column_stack([base["clean_ratio"], base["green_rate"]]).astype(float)
+        self._mean = np.asarray(artifact["scaler"]["mean"], dtype=float)
+        self._scale = np.asarray(artifact["scaler"]["scale"], dtype=float)
+        self._coef = np.asarray(artifact["model"]["coef"], dtype=float)
+        self._intercept = float(artifact["model"]["intercept"])
+        self.predict = lru_cache(maxsize=256)(self._predict)
+
+    @classmethod
+    def load(cls, path, signature):
+        """供 ArtifactStore 调用的加载函数"""
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")), signature)
+
+    def _predict(self, provinces, years, clean_delta, green_delta, clean_ramp, green_ramp):
+        """provinces / years 为元组（便于 LRU 命中）；返回 (省份 × 年份) 展平后的预测表"""
+        rows = np.array([self._row[p] for p in provinces if p in self._row], dtype=np.intp)
+        years = np.asarray(years, dtype=int)
+        t = (years - self.base_year)[None, :]
+        base = self._base[rows]
+        clean = np.clip(base[:, 0:1] + clean_delta + clean_ramp*t, 0, 1).ravel()
+        green = np.clip(base[:, 1:2] + green_delta + green_ramp*t, 0, 1).ravel()
+        X = (np.column_stack([clean, green]) - self._mean) / self._scale
+        return pd.DataFrame({
+            "province": np.repeat(np.asarray(self.provinces, dtype=object)[rows], len(years)),
+            "year": np.tile(years, len(rows)),
+            "clean_ratio": clean,
+            "green_rate": green,
+            "predicted_emission_per_gdp": X @ self._coef + self._intercept,
+        })
@@ -0,0 +1,86 @@
+"""
+synergy.py
+可调权重的协同指数：
+- 由 processed/province_combined.csv 构建 (年份 × 省份 × 3) 的连续数组，三列依次为
+  energy_index（clean_ratio）、eco_index（green_rate）、efficiency_index（-emission_per_gdp）；
+- 逐年标准化方式：zscore（与 process_all.py 相同，总体标准差）、minmax、rank（百分位秩）；
+- 任意权重只需一次矩阵 × 向量运算，结果按 (标准化方式, 权重) 保存在 LRU 中；
+  权重为 0 的指标不参与运算，可借此排除某一指标；
+- 随底层表的 Dataset 版本自动重建（datastore.DerivedCache）。
+"""
+
+import threading
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from datastore import Dataset, Versioned
+
+INDEX_COLUMNS = ("energy_index", "eco_index", "efficiency_index")
+# 原始字段与方向：效率指数取排放强度的相反数
+SOURCE_COLUMNS = (("clean_ratio", 1.0), ("green_rate", 1.0), ("emission_per_gdp", -1.0))
+MODES = ("zscore", "minmax", "rank")
+DEFAULT_WEIGHTS = (0.4, 0.3, 0.3)
+
+
+def standardize(A, mode):
+    """A 为 (年份, 省份, 指标)；沿省份轴逐年标准化，空值保持为空"""
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # 整年缺失时的 nanmean 等警告
+        if mode == "zscore":
+            return (A - np.nanmean(A, axis=1, keepdims=True)) / np.nanstd(A, axis=1, keepdims=True)
+        if mode == "minmax":
+            lo, hi = np.nanmin(A, axis=1, keepdims=True), np.nanmax(A, axis=1, keepdims=True)
+            return (A - lo) / (hi - lo)
+    if mode == "rank":
+        Y, P, K = A.shape
+        # 每个 (年份, 指标) 为一列，一次 rank 完成
+        ranks = pd.DataFrame(A.transpose(1, 0, 2).reshape(P, Y * K)).rank(pct=True).to_numpy()
+        return np.ascontiguousarray(ranks.reshape(P, Y, K).transpose(1, 0, 2))
+    raise ValueError(f"unknown mode: {mode}")
+
+
+class SynergyCube(Versioned):
+    """某一版本 province_combined 的标准化数组"""
+
+    def __init__(self, ds):
+        self.inherit(ds)
+        df = ds.df
+        self.years, yi = np.unique(df["year"].to_numpy(dtype=int), return_inverse=True)
+        provinces, pi = np.unique(df["province"].astype(str).to_numpy(), return_inverse=True)
+        self.provinces = provinces.astype(object)
+        # 原表中每行对应的 (年份, 省份) 位置，输出保持原表行序
+        self._yi, self._pi = yi, pi
+        raw = np.full((len(self.years), len(provinces), len(SOURCE_COLUMNS)), np.nan)
+        for k, (col, sign) in enumerate(SOURCE_COLUMNS):
+            raw[yi, pi, k] = sign * df[col].to_numpy(dtype=float)
+        self._raw = raw
+        self._arrays = {}
+        self._lock = threading.Lock()
+        self.scores = lru_cache(maxsize=64)(self._scores)
+
+    def array(self, mode):
+        """mode 对应的 (年份, 省份, 3) 连续数组（首次使用时计算）"""
+        arr = self._arrays.get(mode)
+        if arr is None:
+            with self._lock:
+                arr = self._arrays.get(mode)
+                if arr is None:
+                    arr = self._arrays[mode] = np.ascontiguousarray(standardize(self._raw, mode))
+        return arr
+
+    def _scores(self, mode, weights):
+        """返回与 province_synergy_index.csv 同结构的 Dataset（已建行号索引，可直接 select）；
+        权重为 0 的指标不参与计算，其缺失不会使得分为空"""
+        w = np.asarray(weights, dtype=float)
+        used = np.flatnonzero(w)
+        S = self.array(mode)[..., used] @ w[used]
+        df = pd.DataFrame({
+            "province": self.provinces[self._pi],
+            "year": self.years[self._yi],
+            "synergy_score": S[self._yi, self._pi],
+        })
+        return Dataset(self.key, df, self.signature, self.version)
+
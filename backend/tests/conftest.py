@@ -0,0 +1,7 @@
+"""测试共用：把 backend/ 与 backend/data/ 加入导入路径（app.py 与 process_all.py 均以脚本目录为根）"""
+
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(BACKEND), str(BACKEND / "data")]
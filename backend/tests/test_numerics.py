@@ -0,0 +1,135 @@
+"""
+数值引擎与参考实现的对照：
+- grouped_ols 与逐组 sklearn LinearRegression；
+- correlation_cube（全部窗口，混合截面与分省）与 pandas DataFrame.corr；
+- scenario_grid 与逐格循环；
+- /api/scenario 与在同一训练集上重新拟合的 StandardScaler + LinearRegression。
+数据取仓库中已提交的 processed / derived 表。
+"""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+import process_all as pa
+
+DATA = Path(__file__).resolve().parents[1] / "data"
+VARIABLES = ["clean_ratio", "green_rate", "emission_per_gdp"]
+
+
+def read(rel):
+    return pd.read_csv(DATA / rel, encoding="utf-8-sig")
+
+
+def test_grouped_ols_matches_linear_regression():
+    rng = np.random.default_rng(0)
+    sizes = [2, 5, 12, 30, 4]
+    codes = np.repeat(np.arange(len(sizes)), sizes)
+    x = rng.normal(10, 3, size=len(codes))
+    x[codes == 4] = 7.0  # 方差为 0 的组：退化为常数模型
+    y = 2.5 * x + rng.normal(0, 1, size=len(codes)) + codes
+    slope, intercept, n = pa.grouped_ols(codes, x, y, len(sizes))
+    for g, size in enumerate(sizes):
+        m = codes == g
+        ref = LinearRegression().fit(x[m, None], y[m])
+        assert n[g] == size
+        assert slope[g] == pytest.approx(ref.coef_[0], abs=1e-9)
+        assert intercept[g] == pytest.approx(ref.intercept_, abs=1e-9)
+
+
+@pytest.fixture(scope="module")
+def combined():
+    return read("processed/province_combined.csv")
+
+
+@pytest.mark.parametrize("window", [1, 3, 5])
+def test_correlation_cube_matches_pandas(combined, window):
+    min_obs = 3
+    years, provinces, pooled, by_province = pa.correlation_cube(combined, VARIABLES, [window], min_obs)
+    for yi, y in enumerate(years):
+        in_window = combined[combined["year"].between(y - window + 1, y)]
+        if yi < window - 1:
+            # 窗口不完整的年份整体为空
+            assert np.isnan(pooled[0, yi]).all() and np.isnan(by_province[0, yi]).all()
+            continue
+        ref = in_window[VARIABLES].corr(min_periods=min_obs).to_numpy()
+        np.testing.assert_allclose(pooled[0, yi], ref, rtol=0, atol=1e-9)
+        for pi, p in enumerate(provinces):
+            ref = in_window[in_window["province"] == p][VARIABLES].corr(min_periods=min_obs).to_numpy()
+            np.testing.assert_allclose(by_province[0, yi, pi], ref, rtol=0, atol=1e-9)
+
+
+def test_scenario_grid_matches_loop():
+    base = pd.DataFrame({"province": ["甲", "乙"], "clean_ratio": [0.3, 0.98], "green_rate": [0.4, 0.01]})
+    scen = pd.DataFrame({
+        "name": ["baseline", "up", "down"],
+        "clean_delta": [0.0, 0.05, -0.1], "clean_ramp": [0.0, 0.01, 0.0],
+        "clean_floor": [0.0, 0.0, 0.25], "clean_cap": [1.0, 1.0, 1.0],
+        "green_delta": [0.0, 0.0, -0.02], "green_ramp": [0.0, 0.02, 0.0],
+        "green_floor": [0.0, 0.0, 0.0], "green_cap": [1.0, 0.45, 1.0],
+    })
+    years = np.arange(2023, 2027)
+    clean, green = pa.scenario_grid(base, years, 2022, scen)
+    expected_clean, expected_green = [], []
+    for (_, b), y, (_, s) in itertools.product(base.iterrows(), years, scen.iterrows()):
+        t = y - 2022
+        expected_clean.append(min(max(b.clean_ratio + s.clean_delta + s.clean_ramp * t, s.clean_floor), s.clean_cap))
+        expected_green.append(min(max(b.green_rate + s.green_delta + s.green_ramp * t, s.green_floor), s.green_cap))
+    np.testing.assert_allclose(clean, expected_clean, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(green, expected_green, rtol=0, atol=1e-12)
+
+
+@pytest.fixture(scope="module")
+def client():
+    import app
+    return app.app.test_client()
+
+
+def reference_model():
+    """按 forecast 阶段的预处理在 province_trend 上重新拟合"""
+    trend = read("derived/province_trend.csv")
+    for col in ["clean_ratio", "green_rate"]:
+        trend[col] = trend.groupby("province")[col].transform(lambda x: x.interpolate(limit=3))
+    trend = trend.fillna(trend.mean(numeric_only=True))
+    train = trend.dropna(subset=["emission_per_gdp"])
+    X, y = train[["clean_ratio", "green_rate"]].values, train["emission_per_gdp"].values
+    scaler = StandardScaler().fit(X)
+    return scaler, LinearRegression().fit(scaler.transform(X), y)
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "clean_delta=0.05",
+    "clean_delta=0.02&green_delta=0.02&year_from=2024&year_to=2026",
+    "green_ramp=0.03&clean_ramp=-0.01&provinces=北京,上海",
+])
+def test_scenario_endpoint_matches_sklearn(client, query):
+    resp = client.get(f"/api/scenario?{query}")
+    assert resp.status_code == 200
+    got = pd.DataFrame(resp.get_json())
+    assert len(got)
+    scaler, model = reference_model()
+    expected = model.predict(scaler.transform(got[["clean_ratio", "green_rate"]].to_numpy(float)))
+    np.testing.assert_allclose(got["predicted_emission_per_gdp"], expected, rtol=0, atol=1e-9)
+
+
+def test_scenario_endpoint_matches_pipeline_grid(client):
+    """零增量与 +5pp 情景与流水线写出的 model_output.csv 一致"""
+    out = read("derived/model_output.csv")
+    for name, query in [("baseline", ""), ("clean_plus5pp", "clean_delta=0.05")]:
+        got = pd.DataFrame(client.get(f"/api/scenario?{query}").get_json())
+        ref = out[out["scenario_name"] == name].drop(columns="scenario_name")
+        merged = got.merge(ref, on=["province", "year"], suffixes=("", "_ref"), validate="one_to_one")
+        assert len(merged) == len(ref)
+        for col in ["clean_ratio", "green_rate", "predicted_emission_per_gdp"]:
+            np.testing.assert_allclose(merged[col], merged[f"{col}_ref"], rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("query", ["clean_delta=nan", "green_ramp=inf", "clean_delta=abc"])
+def test_scenario_endpoint_rejects_bad_deltas(client, query):
+    assert client.get(f"/api/scenario?{query}").status_code == 400
@@ -0,0 +1,15 @@
+"""就绪检查覆盖 warm_store 预热的全部对象"""
+
+import app as api
+
+
+def test_ready_after_warm_store():
+    assert api.warm_store() == []
+    resp = api.app.test_client().get("/api/ready")
+    assert resp.status_code == 200 and resp.get_json()["pending"] == []
+
+
+def test_ready_reports_unbuilt_derived_cache(monkeypatch):
+    monkeypatch.setattr(api.rollup_cubes, "_obj", None)
+    resp = api.app.test_client().get("/api/ready")
+    assert resp.status_code == 503 and resp.get_json()["pending"] == ["rollup_cube"]
@@ -0,0 +1,49 @@
+"""ResponseCache 的条目数 / 字节数上限与失效"""
+
+from respcache import ResponseCache
+
+
+def body(n, fill=b"x"):
+    return fill * n
+
+
+def test_evicts_oldest_until_under_byte_budget():
+    cache = ResponseCache(maxsize=100, maxbytes=1000)
+    for i in range(5):
+        cache.put(i, body(300), "application/json", ["t"])
+    st = cache.stats()
+    assert st["bytes"] <= 1000 and st["size"] == 3
+    assert cache.get(0) is None and cache.get(1) is None and cache.get(4) is not None
+
+
+def test_encoded_bytes_count_towards_budget():
+    cache = ResponseCache(maxsize=100, maxbytes=4000)
+    first = cache.put("a", bytes(range(256)) * 6, "application/json", ["t"])
+    cache.put("b", bytes(range(256)) * 6, "application/json", ["t"])
+    before = cache.stats()["bytes"]
+    cache.encode(first, "gzip")
+    assert cache.stats()["bytes"] == before + len(first.encoded["gzip"])
+    # 超出预算后最久未用的条目被淘汰
+    cache.get("a")
+    cache.put("c", bytes(range(256)) * 6, "application/json", ["t"])
+    assert cache.stats()["bytes"] <= 4000
+    assert cache.get("b") is None and cache.get("a") is not None
+
+
+def test_oversized_entry_is_not_cached():
+    cache = ResponseCache(maxsize=10, maxbytes=100)
+    entry = cache.put("big", body(500), "application/json", ["t"])
+    assert entry.body == body(500)
+    assert cache.get("big") is None and cache.stats()["bytes"] == 0
+
+
+def test_replace_and_invalidate_keep_byte_count():
+    cache = ResponseCache(maxsize=10, maxbytes=10_000)
+    cache.put("a", body(100), "application/json", ["t1"])
+    cache.put("a", body(200), "application/json", ["t1"])
+    cache.put("b", body(300), "application/json", ["t2"])
+    assert cache.stats()["bytes"] == 500
+    cache.invalidate("t1")
+    assert cache.stats()["bytes"] == 300 and cache.get("a") is None
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
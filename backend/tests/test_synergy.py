@@ -0,0 +1,36 @@
+"""可调权重协同指数：默认权重与流水线输出一致，权重为 0 的指标不影响得分"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as api
+
+
+@pytest.fixture(scope="module")
+def client():
+    return api.app.test_client()
+
+
+def frame(client, query):
+    resp = client.get(f"/api/synergy?{query}")
+    assert resp.status_code == 200
+    return pd.DataFrame(resp.get_json())
+
+
+def test_default_weights_match_pipeline(client):
+    static = pd.DataFrame(client.get("/api/synergy").get_json())
+    weighted = frame(client, "weights=0.4,0.3,0.3")
+    pd.testing.assert_frame_equal(static, weighted, check_exact=False, rtol=0, atol=1e-12)
+
+
+def test_zero_weight_excludes_indicator(client):
+    std = pd.DataFrame(client.get("/api/standardized").get_json())
+    got = frame(client, "weights=1,0,0").merge(std, on=["province", "year"], validate="one_to_one")
+    # 只看 energy_index：其余指标缺失的行也应有得分
+    assert (got["eco_index"].isna() | got["efficiency_index"].isna()).any()
+    np.testing.assert_allclose(got["synergy_score"], got["energy_index"], rtol=0, atol=1e-9)
+
+
+def test_all_zero_weights_rejected(client):
+    assert client.get("/api/synergy?weights=0,0,0").status_code == 400
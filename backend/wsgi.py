@@ -0,0 +1,21 @@
+"""
+wsgi.py
+生产入口：gunicorn -c gunicorn.conf.py wsgi:app
+
+导入时即预热全部数据表（配合 preload_app，在 fork 之前完成），
+各 worker 以写时复制共享同一份只读 DataFrame；Feather 文件为内存映射，
+多个进程直接共享同一份页缓存。
+"""
+
+import gc
+
+from app import app, warm_store
+
+missing = warm_store()
+if missing:
+    app.logger.warning("预热时缺少数据表或工件: %s", ", ".join(f"{folder}/{name}" for folder, name in missing))
+
+# 冻结预热阶段创建的对象，避免 fork 后的 GC 扫描触碰共享页导致复制
+gc.freeze()
+
+__all__ = ["app"]